@@ -1,12 +1,13 @@
-from crawler.healthcare_crawlers import AMCMealTherapyCrawler, SSHDiabetesCrawler
-from data_loader.data_saver import JsonSaver
-from data_loader.structured_data_loader import JsonLoader
-from model.retriever import FAISSBM25Retriever
+from model.retriever_manager import HotSwapRetriever
+from model.conversational_retriever import ConversationalRetriever
 from model.openai_langchain import RAGChain
-from preprocessor.structured_data import json_to_langchain_doclist
+from model.prompts import RAG_PROMPT_MESSAGES
+from model.reranker import load_reranker
+from model.session_store import SessionStore, SQLiteSessionBackend
 from database.table_manager import UserTableManager, ChatLogTableManager
-
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from database.chat_writer import ChatLogWriter
+from pipeline.crawl import crawl_and_update, get_crawl_tasks
+from pipeline.index import build_retriever_from_paths, load_index
 
 import streamlit as st
 from dotenv import load_dotenv
@@ -15,49 +16,55 @@ import os
 # st.session_state 목록
 # - OPENAI_API_KEY: 모델에 사용할 OpenAI API Key. 환경변수로부터 로드하거나 사용자에게 입력 받음
 # - retriever: user_query를 입력받아 관련 문서를 검색. set_retriever에서 생성
+# - conversational_retriever: 대화별로 이전 검색 후보를 재사용하는 retriever. set_conversational_retriever에서 생성
 # - rag_chain: set_chain에서 prompt template 정의 후 생성한 chain.
 # - messages: {'role':, 'content':}로 구성된 리스트. 사용자 쿼리와 모델 응답을 담고 있음.
 # - user: ['id':, 'username':] 현재 로그인된 사용자의 계정정보
 # - session_id: 현재 사용자의 대화 session_id
-
-def crawl_and_save(crawler, save_path, force_crawl=False, **kwargs):
-    """
-    크롤러를 실행하고 JSON 파일로 저장
-    crawl_and_update에서 호출됨
-    """
-    if os.path.exists(save_path) and not force_crawl:
-        print(f">>> 이미 존재하는 파일이 있습니다: {save_path} -> 새로 크롤링하지 않고 기존 데이터를 사용합니다.")
-        return
-
-    crawler_instance = crawler(**kwargs) if kwargs else crawler()
-    articles = crawler_instance.run()
-    json_saver = JsonSaver()
-    json_saver.save(save_path, articles)
-    print(f"저장 완료: {save_path}")
-
-def crawl_and_update(crawl_tasks, force_crawl:bool):
+# - selected_authors: 사이드바에서 선택한 검색 대상 출처(author) 목록
+# - chat_log_session, chat_log, chat_log_has_more: 조회 중인 저장된 대화의 session_id, 지금까지 불러온 메세지, 이전 메세지 존재 여부
+
+CHAT_LOG_PAGE_SIZE = 20  # 저장된 대화 내역을 한 번에 불러올 메세지 수
+FAST_START = os.environ.get('HGCB_FAST_START') == '1'  # 1이면 앱 실행 중에 크롤링하지 않음
+TOP_K = 2  # 검색 엔진별로 가져올 문서 수 (reranker 사용 시 최종 문서 수)
+# HGCB_RERANKER: 비우면 rerank하지 않음, 'lexical' 혹은 로컬 CrossEncoder 모델 경로
+# reranker 사용 시 검색 엔진별로 RERANK_CANDIDATE_K개를 가져와 RERANK_BUDGET_MS 안에 TOP_K개로 rerank
+RERANKER = os.environ.get('HGCB_RERANKER')
+RERANK_CANDIDATE_K = 20
+RERANK_BUDGET_MS = 50
+# HGCB_CONVERSATIONAL_RETRIEVAL: 0이면 후속 질문도 매번 새로 검색 (기본값 1: 이전 검색 후보 재사용)
+CONVERSATIONAL_RETRIEVAL = os.environ.get('HGCB_CONVERSATIONAL_RETRIEVAL', '1') == '1'
+SESSION_MAX_COUNT = 1000  # 메모리에 유지할 최대 대화 수
+SESSION_IDLE_TTL = 60 * 60  # 이 시간(초) 동안 사용하지 않은 대화는 메모리에서 내림
+SESSION_BACKEND_MAX_AGE = 7 * 24 * 60 * 60  # 메모리에서 내린 대화 기록을 보관할 기간(초)
+
+def build_retriever(openai_api_key):
     """
-    실행할 크롤러를 명시, res의 json문서들을 업데이트
-    main에서 호출됨
+    RAG 0~3: 문서로드~검색기 생성
+    HotSwapRetriever가 새 retriever 버전을 만들 때마다 호출됨
+    python -m pipeline build-index로 만든 인덱스가 있으면 불러오기만 하고,
+    없으면 기존처럼 앱에서 크롤링(fast-start 모드 제외)과 임베딩을 실행
     """
+    retriever_kwargs = {"reranker": load_reranker(RERANKER), "candidate_k": RERANK_CANDIDATE_K, "rerank_budget_ms": RERANK_BUDGET_MS}
+    retriever = load_index(openai_api_key, top_k=TOP_K, **retriever_kwargs)
+    if retriever is not None:
+        return retriever
+
+    print(">>> 저장된 인덱스가 없어 앱에서 인덱스를 생성합니다. (python -m pipeline build-index 권장)")
+    # RAG 0. Crawl Data
+    # fast-start 모드에서는 크롤링하지 않고 이미 있는 json문서만 사용 (크롤링은 python -m pipeline crawl)
+    crawl_tasks = get_crawl_tasks(openai_api_key)
+    if FAST_START:
+        crawl_tasks = [task for task in crawl_tasks if os.path.exists(task['save_path'])]
+        print(f">>> fast-start 모드: json문서 {len(crawl_tasks)}개만 사용")
+        if not crawl_tasks:
+            raise FileNotFoundError("fast-start 모드인데 크롤링된 json문서가 없습니다. "
+                                    "먼저 python -m pipeline crawl을 실행하거나 HGCB_FAST_START 없이 실행하세요.")
+    else:
+        crawl_and_update(crawl_tasks, force_crawl=False)
 
-    for task in crawl_tasks:
-        crawl_and_save(
-            task["crawler"],
-            task["save_path"],
-            force_crawl=force_crawl,
-            **task["kwargs"]
-        )
-
-def split_documents(documents, chunk_size, overlap):
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=overlap, length_function=len)
-    split_result = text_splitter.split_documents(documents)
-    return split_result
-
-def create_retriever(retriever, documents, **kwargs):
-    # retriever 클래스와 임베딩할 documents를 넘겨받아 retriever 생성
-    retriever_instance = retriever(documents, **kwargs) if kwargs else retriever(documents)
-    return retriever_instance
+    # RAG 1~3. Load Data, Split Documents, Indexing
+    return build_retriever_from_paths([task['save_path'] for task in crawl_tasks], openai_api_key, top_k=TOP_K, **retriever_kwargs)
 
 @st.dialog("OpenAI API Key 요청")
 def ask_openai_api_key():
@@ -107,8 +114,30 @@ def user_join(db_user, db_chatlog):
             db_user.update_last_login(st.session_state['user']['id'])
             st.rerun()
 
+@st.cache_resource
+def get_session_store():
+    # 모든 사용자 세션의 RAGChain이 공유하는 대화 기록 저장소. 한도를 넘으면 오래된 대화부터 SQLite로 내림
+    return SessionStore(max_sessions=SESSION_MAX_COUNT, idle_ttl=SESSION_IDLE_TTL,
+                        backend=SQLiteSessionBackend(max_age=SESSION_BACKEND_MAX_AGE))
+
+def get_history_key():
+    # session_id는 사용자별로 매겨지므로, 공유 저장소에서는 user_id와 함께 key로 사용
+    return f"{st.session_state['user']['id']}:{st.session_state['session_id']}"
+
+@st.cache_resource
+def get_chat_writer():
+    # 모든 사용자 세션이 공유하는 채팅 저장 스레드. 시작 시 journal에 남은 기록을 DB에 다시 저장
+    return ChatLogWriter(ChatLogTableManager())
+
+def get_next_session_id(db_chatlog):
+    """
+    새 대화의 session_id 반환
+    chat_title에 행을 먼저 만들어 번호를 할당받으므로, 현재 대화가 아직 DB에 저장되지 않았어도 번호가 겹치지 않음
+    """
+    return str(db_chatlog.get_new_session_id(st.session_state['user']['id']))
+
 @st.dialog("대화 저장하기")
-def archive_chat(db_chatlog):
+def archive_chat(db_chatlog, chat_writer):
     if len(st.session_state.messages) == 0:
         st.write("저장할 대화가 없습니다.")
         if st.button("확인"):
@@ -120,133 +149,45 @@ def archive_chat(db_chatlog):
         session_id = st.session_state['session_id']
         user_id = st.session_state['user']['id']
         if chat_title and btn:
-            # 채팅목록 추가 in chat_title
-            db_chatlog.create_chat_title(session_id, user_id, chat_title)
-            # 채팅 내용 저장 in chat_log
-            for message in st.session_state.messages:
-                sendor = message['role']
-                content = message['content']
-                db_chatlog.insert_chat_log(session_id, user_id, sendor, content)
+            # 채팅 내용은 대화 중에 chat_writer로 저장되므로 제목만 저장 in chat_title
+            chat_writer.set_title(session_id, user_id, chat_title)
             # 현재 대화 초기화
+            st.session_state['session_id'] = get_next_session_id(db_chatlog)
             st.session_state.messages = []
             st.session_state['rag_chain'].reset_storage()
-            st.session_state['session_id'] = str(db_chatlog.get_new_session_id(st.session_state['user']['id']))
             st.rerun()
 
 def main():
     @st.cache_resource
     def set_retriever():
-        """RAG 0~3: 문서로드~검색기 생성"""
-        # RAG 0. Crawl Data
-        crawl_tasks = [
-            {
-                "crawler": AMCMealTherapyCrawler,
-                "save_path": './res/amc-mealtherapy.json',
-                "kwargs": {}
-            },
-            {
-                "crawler": SSHDiabetesCrawler,
-                "save_path": './res/ssh-diabetes.json',
-                "kwargs": {"api_key": openai_api_key}
-            }
-        ]
-        crawl_and_update(crawl_tasks, force_crawl=False) 
-        
-        # RAG 1. Load Data
-        json_doc_paths = [crawler['save_path'] for crawler in crawl_tasks]
-        json_loader = JsonLoader()
-        documents = []
-        for path in json_doc_paths:
-            json_doc = json_loader.load(path)
-            documents += json_to_langchain_doclist(json_doc)
-        
-        # RAG 2. Split Documents
-        splitted_documents = split_documents(documents, 
-                                        chunk_size=300, 
-                                        overlap=100)
-        
-        # RAG 3. Indexing: Embed documents, set retriever
-        return create_retriever(FAISSBM25Retriever, splitted_documents, **{"openai_api_key": openai_api_key, "top_k": 2})
-    
+        """RAG 0~3: 검색기 생성. 이후 인덱스 갱신은 reload()로 백그라운드에서 교체"""
+        return HotSwapRetriever(lambda: build_retriever(openai_api_key))
+
+    @st.cache_resource
+    def set_conversational_retriever():
+        """RAG 3: 대화별 검색 후보 재사용. 모든 사용자가 공유하며 get_history_key()로 대화를 구분"""
+        return ConversationalRetriever(set_retriever(), max_sessions=SESSION_MAX_COUNT)
+
     def set_chain():
         """RAG 3.5: chain 생성"""
         print(">>> RAGChain 생성 in st.session_state")
         # RAG 3.5. setup chain
-        rag_prompt_template = """당신은 사용자의 건강 상태와 상황을 이해하고, 공신력 있는 근거 자료를 바탕으로 깊이 있고 실질적인 건강 정보를 제공하는 전문가 AI 챗봇입니다. 
-사용자의 질문에 대해 다음 기준을 따라 답변하세요:
-
-1. **근거 자료 기반 응답**:  
-   제공되는 답변의 정보는 반드시 아래의 <<< 관련 근거자료 >>>에 근거해야 합니다.
-   아래의 <<< 관련 근거자료>>>로 제공된 정보를 벗어나 추측하지 말고, 모든 답변에는 실제 출처를 source_url과 함께 명확히 언급하세요.  
-   - '출처: 서울아산병원'
-
-2. **맞춤형 초기 대화**:  
-   사용자 상황을 이해하기 위해 답변을 완료한 뒤에도 친근하고 구체적인 질문을 던지세요. 예시:  
-   - '현재 가장 걱정되는 건강 문제는 무엇인가요?'  
-   - '어떤 목표를 가지고 계신가요? 혈당 조절, 체중 관리, 아니면 전반적인 건강 개선인가요?'
-
-3. **개인화된 결과 제공**:  
-   사용자의 정보(나이, 성별, 특정 질환)를 바탕으로 맞춤형 솔루션을 제안합니다. 예시:  
-   - '○○님(20대 여성)을 위한 맞춤형 혈당 관리 팁입니다.'  
-   - '2형 당뇨 환자에게 적합한 하루 식사 및 운동 가이드를 제공할게요.'
-
-4. **실질적인 실행 방안 제공**:  
-   관련 근거자료에 실질적인 실행 방안에 대한 정보가 있다면 정보를 **즉시 실행 가능한 형태**로 제시하고, 행동 지침 또는 체크리스트를 포함하세요. 예시:  
-   - '추천 아침 식단: 귀리죽과 삶은 계란'  
-   - '실행 체크리스트:  
-     - [ ] 하루 세 끼 규칙적으로 식사하기  
-     - [ ] 30분 이상 걷기 운동하기  
-     - [ ] 고섬유질 식품 섭취하기'
-
-5. **전문적이고 공감하는 어조**:  
-   전문적이지만 친절하고 따뜻한 어조로 사용자에게 공감하며 안내하세요.
----
-<<< 입력 예시 >>>
-'나는 23살 여성이야. 며칠 전 제2형 당뇨병을 진단받았어. 혈당 수치를 정상으로 유지하는 식사 방법을 알려줘.'
-
-<<< 답변 예시 >>> 
-'안녕하세요. 제2형 당뇨병 진단을 받으셨군요. 혈당 조절은 정말 중요하면서도 신경 쓸 게 많아서 걱정이 크실 것 같아요. 
-하지만 작은 습관부터 차근차근 실천하면 충분히 관리할 수 있으니 너무 부담 갖지 않으셔도 돼요. 제가 도움을 드릴 수 있도록 정확하고 실질적인 정보를 알려드릴게요! 
-
-1. **식사 조절의 필요성**:  
-   당뇨병은 인슐린의 절대적 또는 상대적인 부족으로 인해 고혈당 및 대사 장애를 초래하는 질환입니다. 따라서, 혈당을 정상에 가깝게 유지하고 합병증을 최소화하기 위해 식사 조절이 필요합니다.  
-   - 출처: 서울아산병원 (link)
-
-2. **추천 식단 및 조리 방법**:
-   - **간식**: 정규 식사 사이에 제철 과일과 저지방 우유를 섭취하는 것이 좋습니다.
-   - **조리 방법**: 지방 섭취를 줄이기 위해 튀기거나 부치기 대신 굽기, 찜, 삶는 방법을 주로 선택하세요. 맛을 내기 위해 적당량의 식물성 기름(참기름, 들기름 등)은 사용해도 좋습니다.
-   - 출처: 서울아산병원 (link)
-
-3. **실행 체크리스트**:
-   - [ ] 하루 세 끼 규칙적으로 식사하기
-   - [ ] 고섬유질 식품 섭취하기
-   - [ ] 과도한 설탕과 단순 탄수화물 섭취 줄이기
-   - [ ] 매일 꾸준한 운동(30분 이상 걷기) 하기
-   - 출처: 삼성서울병원 당뇨 월간지 (link)
-
-개인의 건강 상태에 따라 다르게 적용될 수 있으니, 담당 의사나 영양사와 상의하는 것도 좋은 방법입니다. 건강 관리에 도움이 되시길 바랍니다!'
----
-<<< 과거 사용자 채팅 내용 >>>
-{chat_history}
-
-<<< 사용자 입력 >>>
-{query}
-
-<<< 관련 근거자료 >>>
-{context}
-"""
-        prompt_message = [
-            ("system", rag_prompt_template),
-            ("human", "<<< 사용자 입력 >>>\n{query}")
-        ]
-        st.session_state['rag_chain'] = RAGChain(prompt_message, openai_api_key)
+        st.session_state['rag_chain'] = RAGChain(RAG_PROMPT_MESSAGES, openai_api_key, session_store=get_session_store())
 
     def get_chain_response(user_query):
         """RAG 4~5: 검색 & 응답생성"""
         # RAG 4. Retrieval
-        retrieved_documents = st.session_state['retriever'].search_docs(user_query)
+        # 사이드바에서 출처를 일부만 선택했다면 해당 출처의 문서 안에서만 검색 (하나도 선택하지 않았으면 검색 결과 없음)
+        filters = None
+        selected_authors = st.session_state.get('selected_authors')
+        if selected_authors is not None and len(selected_authors) < len(st.session_state['retriever'].metadata_index.values("author")):
+            filters = {"author": selected_authors}
+        if CONVERSATIONAL_RETRIEVAL:
+            retrieved_documents = st.session_state['conversational_retriever'].search_docs(user_query, session_key=get_history_key(), filters=filters)
+        else:
+            retrieved_documents = st.session_state['retriever'].search_docs(user_query, filters=filters)
         # RAG 5. Generate
-        response = st.session_state['rag_chain'].get_response(message_inputs={'query': user_query, 'context': retrieved_documents}, session_id=st.session_state['session_id'])
+        response = st.session_state['rag_chain'].get_response(message_inputs={'query': user_query, 'context': retrieved_documents}, session_id=get_history_key())
         return response
     
     def write_app_title():
@@ -260,13 +201,20 @@ def main():
 
     # retriever, chain 초기화 ----------------------------------
     if 'retriever' not in st.session_state:
-        st.session_state['retriever'] = set_retriever()
+        try:
+            st.session_state['retriever'] = set_retriever()
+        except FileNotFoundError as e:
+            st.error(str(e))
+            st.stop()
+    if 'conversational_retriever' not in st.session_state:
+        st.session_state['conversational_retriever'] = set_conversational_retriever()
     if 'rag_chain' not in st.session_state:
         set_chain()
     
     # database table manager 초기화
     db_user = UserTableManager()
     db_chatlog = ChatLogTableManager()
+    chat_writer = get_chat_writer()
 
     # 채팅 키 초기화 ----------------------------------
     if 'messages' not in st.session_state:
@@ -279,6 +227,13 @@ def main():
             st.session_state.clear()
             st.rerun()
 
+        # 재크롤링 후 서비스 중단 없이 새 인덱스로 교체 (개발버전에서만 쓰는 버튼)
+        st.caption(f"retriever 버전: {st.session_state['retriever'].version}")
+        if st.session_state['retriever'].is_reloading():
+            st.caption("새 인덱스 생성 중...")
+        elif st.button("검색 인덱스 다시 불러오기"):
+            st.session_state['retriever'].reload()
+
         if 'user' in st.session_state:
             st.write(f"user_id: {st.session_state.user['id']} / email: {st.session_state.user['email']}")
 
@@ -290,14 +245,19 @@ def main():
                 st.session_state['rag_chain'].reset_storage()
                 st.rerun()
 
+            authors = st.session_state['retriever'].metadata_index.values("author")
+            st.multiselect("참고할 출처", authors, default=authors, key='selected_authors')
+            if not st.session_state['selected_authors']:
+                st.warning("참고할 출처를 하나 이상 선택해주세요.")
+
             if st.button("대화 내용 저장하고 새로 시작하기"):
-                archive_chat(db_chatlog)
+                archive_chat(db_chatlog, chat_writer)
             
             if st.button("대화 새로 시작하기"):
+                st.session_state['session_id'] = get_next_session_id(db_chatlog)
                 st.session_state.messages = []
                 if 'show_chat_session' in st.session_state:
                     del st.session_state['show_chat_session']
-                st.session_state['session_id'] = str(db_chatlog.get_new_session_id(st.session_state['user']['id']))
                 st.session_state['rag_chain'].reset_storage()
                 print(f">>> 현 session_id: {st.session_state.session_id}")
 
@@ -310,6 +270,7 @@ def main():
                 chat_titles.append(titles[i][2])
                 if st.button(chat_titles[i], use_container_width=True):
                     st.session_state['show_chat_session'] = session_ids[i]
+                    st.session_state['chat_log_session'] = None  # 선택할 때마다 최신 페이지부터 다시 불러오기
 
     # Streamlit UI - 메인 화면 ----------------------------------
     if 'user' in st.session_state:
@@ -318,12 +279,26 @@ def main():
             # 저장된 대화 내역을 클릭한 상태
             selected_idx = session_ids.index(st.session_state['show_chat_session'])
             selected_chat_title = chat_titles[selected_idx]
-            chat_log = db_chatlog.get_session_chat(st.session_state['user']['id'],
-                                                st.session_state['show_chat_session'])
+            # 최근 메세지 한 페이지만 먼저 불러오고, 이전 메세지는 버튼을 눌렀을 때 추가로 불러옴
+            if st.session_state.get('chat_log_session') != st.session_state['show_chat_session']:
+                chat_log, has_more = db_chatlog.get_session_chat_page(st.session_state['user']['id'],
+                                                                    st.session_state['show_chat_session'],
+                                                                    page_size=CHAT_LOG_PAGE_SIZE)
+                st.session_state['chat_log_session'] = st.session_state['show_chat_session']
+                st.session_state['chat_log'] = chat_log
+                st.session_state['chat_log_has_more'] = has_more
             st.markdown(f"<h4>{selected_chat_title}</h4>", unsafe_allow_html=True)
+            if st.session_state['chat_log_has_more'] and st.button("이전 대화 더 보기"):
+                older_chat_log, has_more = db_chatlog.get_session_chat_page(st.session_state['user']['id'],
+                                                                          st.session_state['show_chat_session'],
+                                                                          before_chat_id=st.session_state['chat_log'][0][0],
+                                                                          page_size=CHAT_LOG_PAGE_SIZE)
+                st.session_state['chat_log'] = older_chat_log + st.session_state['chat_log']
+                st.session_state['chat_log_has_more'] = has_more
+                st.rerun()
             chat_container = st.container()
             with chat_container:
-                for chat in chat_log:
+                for chat in st.session_state['chat_log']:
                     sender = chat[3]
                     message = chat[4]
                     st.chat_message(sender).write(message)
@@ -336,16 +311,20 @@ def main():
                     st.markdown(message['content'])
             
             # user input에 반응
-            if user_query := st.chat_input("궁금한 점을 입력하세요."):
+            # 출처를 하나도 선택하지 않았으면 전체 문서를 검색하지 않도록 입력을 막음
+            no_sources = st.session_state.get('selected_authors') == []
+            if user_query := st.chat_input("궁금한 점을 입력하세요." if not no_sources else "참고할 출처를 선택해주세요.", disabled=no_sources):
                 with st.chat_message('user'):
                     st.markdown(user_query)
                 # session_state.messages에 추가
                 st.session_state.messages.append({"role": "user", "content": user_query})
+                chat_writer.append_chat(st.session_state['session_id'], st.session_state['user']['id'], 'user', user_query)
 
                 response = get_chain_response(user_query)
                 with st.chat_message('ai'):
                     st.markdown(response)
                 st.session_state.messages.append({"role": "ai", "content": response})
+                chat_writer.append_chat(st.session_state['session_id'], st.session_state['user']['id'], 'ai', response)
             
     else:
         # 로그인 정보가 없을 때 화면
@@ -1,5 +1,8 @@
 from crawler.base_crawler import BaseCrawler
 from model.openai_langchain import ImageDescriptionChain
+from preprocessor.image import encode_images_parallel
+
+from concurrent.futures import ProcessPoolExecutor
 
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import NoSuchElementException
@@ -111,6 +114,18 @@ class SSHDiabetesCrawler(BaseCrawler):
 	- 불명확하거나 손상된 부분이 있으면 그대로 표시하고 추정하지 마세요."""
 
         self.table_from_image_chain = ImageDescriptionChain(system_prompt, api_key)
+        self.image_executor = None  # run() 동안 모든 기사가 공유하는 이미지 리사이즈용 프로세스 풀
+        self.image_workers = min(4, os.cpu_count() or 1)
+
+    def run(self):
+        # 기사마다 이미지가 1~3개뿐이라 매번 프로세스 풀을 만들면 시작 비용이 리사이즈 시간만큼 들어감
+        # 크롤링 한 번에 하나의 풀을 만들어 모든 기사에서 재사용
+        with ProcessPoolExecutor(max_workers=self.image_workers) as executor:
+            self.image_executor = executor
+            try:
+                return super().run()
+            finally:
+                self.image_executor = None
     
     def get_article_links(self):
         self.driver.get(self.base_url)
@@ -141,7 +156,9 @@ class SSHDiabetesCrawler(BaseCrawler):
         elements = content_div.find_elements(By.XPATH, "./*")
 
         # 본문 내 element별로 처리 후 포함
+        # 이미지는 경로만 모아두고, 본문 처리 후 한 번에 리사이즈한 다음 표를 추출
         processed_content = []
+        image_positions = []
         for element in elements:
             tag_name = element.tag_name
             if tag_name in ['h1', 'h2', 'h3', 'h4', 'h5']:
@@ -162,8 +179,14 @@ class SSHDiabetesCrawler(BaseCrawler):
                             if img_src:
                                 local_image_path = self.download_image(img_src)
                                 if local_image_path:
-                                    img_description = self.table_from_image_chain.get_response('', local_image_path)
-                                    processed_content.append(img_description)
+                                    image_positions.append((len(processed_content), local_image_path))
+                                    processed_content.append(None)
+
+        # 기사 내 이미지를 프로세스 풀에서 동시에 리사이즈해 캐시에 올린 뒤, 캐시된 이미지로 표 추출
+        if image_positions:
+            encode_images_parallel([path for _, path in image_positions], executor=self.image_executor)
+            for position, local_image_path in image_positions:
+                processed_content[position] = self.table_from_image_chain.get_response('', local_image_path)
         
         # 처리된 본문 내용을 하나의 문자열로 병합
         combined_content = "\n".join(processed_content)
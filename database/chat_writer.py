@@ -0,0 +1,182 @@
+import pymysql
+import threading
+import queue
+import json
+import time
+import os
+
+class ChatLogWriter:
+    """
+    채팅 메세지를 로컬 journal 파일에 즉시 append한 뒤, 백그라운드 스레드에서 모아서 DB(chat_log)에 저장
+    - 채팅 응답 경로에서는 DB를 기다리지 않고 journal append(fsync)만 실행
+    - DB 저장에 성공한 위치를 offset 파일에 기록하고, 앱 시작 시 그 이후 기록을 다시 저장(replay)
+    - DB 저장 직후 offset 기록 전에 종료되면 일부 메세지가 중복 저장될 수 있음 (at-least-once)
+    - DB 연결 문제는 재시도하고, 다시 시도해도 성공할 수 없는 기록(IntegrityError 등)은 dead-letter 파일로 옮긴 뒤 다음 기록을 저장
+    """
+    def __init__(self, db_chatlog, journal_path='./res/journal/chat_log.jsonl', batch_size=50, flush_interval=1.0, retry_interval=5.0):
+        """
+        db_chatlog: insert_chat_logs, upsert_chat_title을 가진 ChatLogTableManager
+        batch_size: 한 번에 DB에 저장할 최대 기록 수
+        flush_interval: 첫 기록을 받은 뒤 같은 배치로 모을 기록을 기다리는 시간(초)
+        retry_interval: DB 저장 실패 시 재시도 간격(초)
+        """
+        self.db_chatlog = db_chatlog
+        self.journal_path = journal_path
+        self.offset_path = journal_path + '.offset'
+        self.dead_letter_path = journal_path + '.dead'
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+
+        self._queue = queue.Queue()
+        self._journal_lock = threading.Lock()  # journal append와 정리(truncate)가 겹치지 않도록 함
+        self._stop = threading.Event()
+
+        os.makedirs(os.path.dirname(journal_path), exist_ok=True)
+        self._replay()
+        self._journal = open(journal_path, 'ab')
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def append_chat(self, session_id, user_id, sender, message):
+        self._append({"op": "chat", "session_id": session_id, "user_id": user_id, "sender": sender, "message": message})
+
+    def set_title(self, session_id, user_id, title):
+        self._append({"op": "title", "session_id": session_id, "user_id": user_id, "title": title})
+
+    def pending_count(self):
+        return self._queue.qsize()
+
+    def _append(self, record):
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        with self._journal_lock:
+            self._journal.write(line)
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            end_offset = self._journal.tell()
+        self._queue.put((record, end_offset))
+
+    def _read_offset(self):
+        if not os.path.exists(self.offset_path):
+            return 0
+        with open(self.offset_path, 'r') as file:
+            return int(file.read().strip() or 0)
+
+    def _write_offset(self, offset):
+        tmp_path = self.offset_path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            file.write(str(offset))
+        os.replace(tmp_path, self.offset_path)
+
+    def _replay(self):
+        # 마지막으로 DB에 저장된 위치 이후의 기록을 다시 큐에 넣음
+        if not os.path.exists(self.journal_path):
+            return
+        offset = self._read_offset()
+        if offset > os.path.getsize(self.journal_path):
+            offset = 0
+        count = 0
+        with open(self.journal_path, 'r+b') as file:
+            file.seek(offset)
+            for line in file:
+                if not line.endswith(b'\n'):
+                    # 기록 도중 종료되어 잘린 마지막 줄은 버리고, 이후 append가 이어 붙지 않도록 잘라냄
+                    file.truncate(offset)
+                    break
+                offset += len(line)
+                self._queue.put((json.loads(line), offset))
+                count += 1
+        if count:
+            print(f">>> chat journal에서 DB에 저장되지 않은 기록 {count}개를 다시 저장합니다.")
+
+    def _run(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            # 첫 기록 이후 flush_interval 동안 들어온 기록을 같은 배치로 모음
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+
+            segments = self._split_segments(batch)
+            while segments:
+                segment = segments[0]
+                try:
+                    saved = self._flush(segment)
+                except pymysql.MySQLError as e:
+                    if len(segment) > 1:
+                        # 어느 기록이 문제인지 알 수 없으므로 구간을 기록 하나씩으로 나눠 다시 저장
+                        segments[0:1] = [[item] for item in segment]
+                        continue
+                    self._dead_letter(segment[0][0], e)
+                    saved = True
+                if not saved:
+                    print(f">>> chat journal DB 저장 실패, {self.retry_interval}초 후 재시도")
+                    if self._stop.wait(self.retry_interval):
+                        return  # 종료 중 DB 저장 실패: journal에 남아 다음 실행 시 replay됨
+                    continue
+                # 저장(혹은 dead-letter로 이동)한 구간까지 offset을 옮겨, 재시도나 replay 시 중복 저장을 줄임
+                self._write_offset(segment[-1][1])
+                segments.pop(0)
+            self._compact()
+
+    def _split_segments(self, batch):
+        # journal 순서를 지키면서 연속된 chat 기록은 한 구간으로 묶고, title 기록은 따로 한 구간으로 나눔
+        segments = []
+        for item in batch:
+            record = item[0]
+            if record["op"] == "chat" and segments and segments[-1][-1][0]["op"] == "chat":
+                segments[-1].append(item)
+            else:
+                segments.append([item])
+        return segments
+
+    def _flush(self, segment):
+        """
+        Returns:
+            bool: 저장 성공 여부. False면 DB 연결 문제로 재시도 필요
+        Raises:
+            pymysql.MySQLError: 다시 시도해도 성공할 수 없는 기록이 포함된 경우
+        """
+        try:
+            if segment[0][0]["op"] == "chat":
+                rows = [(record["session_id"], record["user_id"], record["sender"], record["message"])
+                        for record, _ in segment]
+                return self.db_chatlog.insert_chat_logs(rows)
+            record = segment[0][0]
+            return self.db_chatlog.upsert_chat_title(record["session_id"], record["user_id"], record["title"])
+        except pymysql.MySQLError:
+            raise
+        except Exception as e:
+            print(f">>> MySQL Error: {e}")
+            return False
+
+    def _dead_letter(self, record, error):
+        # 저장할 수 없는 기록은 오류와 함께 별도 파일에 남기고, 이후 기록 저장을 막지 않도록 건너뜀
+        line = (json.dumps({"record": record, "error": str(error)}, ensure_ascii=False) + '\n').encode('utf-8')
+        with open(self.dead_letter_path, 'ab') as file:
+            file.write(line)
+            file.flush()
+            os.fsync(file.fileno())
+        print(f">>> chat journal 기록을 DB에 저장할 수 없어 {self.dead_letter_path}로 옮김: {error}")
+
+    def _compact(self):
+        # 모든 기록이 DB에 저장되었으면 journal을 비워 파일이 계속 커지지 않도록 함
+        with self._journal_lock:
+            if self._queue.empty() and self._journal.tell() == self._read_offset():
+                # journal을 먼저 비운 뒤 offset을 0으로 기록. 중간에 종료되어도 _replay가 파일 크기보다 큰 offset을
+                # 0으로 되돌리므로 기록을 잃거나 이미 저장한 기록을 다시 저장하지 않음
+                self._journal.truncate(0)
+                self._journal.seek(0)
+                self._write_offset(0)
+
+    def close(self, timeout=10):
+        # 남은 기록을 최대 timeout초 동안 DB에 저장한 뒤 종료
+        self._stop.set()
+        self._thread.join(timeout)
+        self._journal.close()
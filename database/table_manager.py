@@ -1,12 +1,18 @@
 from database.config import *
 import pymysql
 
+NEW_SESSION_TITLE = "새 대화"  # get_new_session_id로 만든 session의 임시 제목. 첫 메세지가 저장되면 메세지로 바뀜
+
 class BaseTableManager:
     def __init__(self):
         self.connection = None
         self.cursor = None
 
-    def connect(self):
+    def connect(self, cursor_class=None):
+        """
+        cursor_class: pymysql cursor 클래스. None이면 기본(버퍼링) cursor,
+                      pymysql.cursors.SSCursor를 주면 결과를 서버에서 스트리밍으로 읽음
+        """
         try:
             self.connection = pymysql.connect(
                 host=DB_HOST,
@@ -17,9 +23,10 @@ class BaseTableManager:
                 charset='utf8',
                 read_timeout=60 # with the read_timeout parameter being set the connection error is being thrown out
             )
-            self.cursor = self.connection.cursor()
+            self.cursor = self.connection.cursor(cursor_class)
         except pymysql.MySQLError as e:
             print(f">>> MySQL Error: {e}")
+            self.connection = None  # 이전 연결이 남아 있지 않도록 연결 실패를 표시
     
     def close(self):
         if self.connection:
@@ -118,19 +125,115 @@ class ChatLogTableManager(BaseTableManager):
         finally:
             self.close()
 
+    def _claim_chat_titles(self, titles):
+        """
+        chat_title이 아직 없는 session은 임시 제목으로 생성하고, 모든 session이 해당 사용자의 것인지 확인
+        titles: {(session_id, user_id): 임시 제목}
+        session_id는 get_new_session_id에서 chat_title 전체 기준으로 할당하므로 보통은 항상 해당 사용자의 것이며,
+        그래도 다른 사용자의 session이면 덮어쓰지 않고 IntegrityError 발생
+        """
+        title_sql = """
+        INSERT IGNORE INTO chat_title (session_id, user_id, title)
+        VALUES (%s, %s, %s)
+        """
+        owner_sql = """
+        SELECT user_id
+        FROM chat_title
+        WHERE session_id = %s
+        """
+        provisional_sql = """
+        UPDATE chat_title
+        SET title = %s
+        WHERE session_id = %s AND user_id = %s AND title = %s
+        """
+        self.cursor.executemany(title_sql, [(session_id, user_id, title) for (session_id, user_id), title in titles.items()])
+        for session_id, user_id in titles:
+            self.cursor.execute(owner_sql, (session_id,))
+            owner = self.cursor.fetchone()
+            if owner is None or str(owner[0]) != str(user_id):
+                raise pymysql.IntegrityError(f"session {session_id}는 사용자 {user_id}의 대화가 아닙니다.")
+        # get_new_session_id에서 만든 임시 제목은 첫 메세지로 변경
+        self.cursor.executemany(provisional_sql, [(title, session_id, user_id, NEW_SESSION_TITLE)
+                                                  for (session_id, user_id), title in titles.items()])
+
+    def insert_chat_logs(self, rows):
+        """
+        여러 메세지를 한 번의 연결, 한 트랜잭션으로 저장 (ChatLogWriter에서 호출)
+        rows: (session_id, user_id, sender, message) 리스트
+        chat_title이 아직 없는 session은 첫 메세지로 임시 제목을 만들어 FK를 만족시킴 (대화 저장 시 제목 변경)
+        Returns:
+            bool: 저장 성공 여부. DB 연결 문제(OperationalError 등)로 실패하면 False
+        Raises:
+            pymysql.MySQLError: 다시 시도해도 성공할 수 없는 오류 (IntegrityError, DataError, 다른 사용자의 session 등)
+        """
+        self.connect()
+        if self.connection is None:
+            return False
+        log_sql = """
+        INSERT INTO chat_log (session_id, user_id, sender, message)
+        VALUES (%s, %s, %s, %s)
+        """
+        titles = {}
+        for session_id, user_id, sender, message in rows:
+            titles.setdefault((session_id, user_id), message[:50])
+        try:
+            self._claim_chat_titles(titles)
+            self.cursor.executemany(log_sql, rows)
+            self.connection.commit()
+            return True
+        except (pymysql.OperationalError, pymysql.InterfaceError) as e:
+            print(f">>> MySQL Error: {e}")
+            return False
+        except pymysql.MySQLError as e:
+            print(f">>> MySQL Error: {e}")
+            self.connection.rollback()
+            raise
+        finally:
+            self.close()
+
+    def upsert_chat_title(self, session_id, user_id, chat_title):
+        """
+        chat_title이 없으면 생성하고, 있으면(임시 제목) 해당 사용자의 session일 때만 제목 변경
+        Returns:
+            bool: 저장 성공 여부. DB 연결 문제(OperationalError 등)로 실패하면 False
+        Raises:
+            pymysql.MySQLError: 다시 시도해도 성공할 수 없는 오류 (다른 사용자의 session 등)
+        """
+        self.connect()
+        if self.connection is None:
+            return False
+        sql = """
+        UPDATE chat_title
+        SET title = %s
+        WHERE session_id = %s AND user_id = %s
+        """
+        try:
+            self._claim_chat_titles({(session_id, user_id): chat_title})
+            self.cursor.execute(sql, (chat_title, session_id, user_id))
+            self.connection.commit()
+            return True
+        except (pymysql.OperationalError, pymysql.InterfaceError) as e:
+            print(f">>> MySQL Error: {e}")
+            return False
+        except pymysql.MySQLError as e:
+            print(f">>> MySQL Error: {e}")
+            self.connection.rollback()
+            raise
+        finally:
+            self.close()
+
     def get_new_session_id(self, user_id):
-        # 사용자의 마지막 session_id를 가져와 1을 더해 새로운 session_id 반환
+        # chat_title.session_id는 전체 테이블에서 유일한 AUTO_INCREMENT이므로, 임시 제목으로 행을 먼저 만들어 번호를 할당받음
+        # (사용자별 MAX + 1은 다른 사용자의 session 번호와 겹침)
         self.connect()
         sql = """
-        SELECT MAX(session_id) AS last_session
-        FROM chat_title
-        WHERE user_id = %s
+        INSERT INTO chat_title (user_id, title)
+        VALUES (%s, %s)
         """
         try:
-            self.cursor.execute(sql, (user_id,))
-            result = self.cursor.fetchone()
-            last_session_id = result[0] if result[0] else 0
-            return last_session_id + 1
+            self.cursor.execute(sql, (user_id, NEW_SESSION_TITLE))
+            self.connection.commit()
+            return self.cursor.lastrowid
         except pymysql.MySQLError as e:
             print(f">>> MySQL Error: {e}")
             return 9999
@@ -139,9 +242,11 @@ class ChatLogTableManager(BaseTableManager):
     
     def get_chat_titles(self, user_id):
         self.connect()
+        # 메세지가 하나도 없는 session(get_new_session_id로 만들고 대화하지 않은 경우)은 제외
         sql = """
         SELECT * FROM chat_title
         WHERE user_id = %s
+        AND EXISTS (SELECT 1 FROM chat_log WHERE chat_log.session_id = chat_title.session_id)
         """
         try:
             self.cursor.execute(sql, (user_id,))
@@ -167,4 +272,35 @@ class ChatLogTableManager(BaseTableManager):
             print(f">>> MySQL Error: {e}")
             return 9999
         finally:
-            self.close()
\ No newline at end of file
+            self.close()
+
+    def get_session_chat_page(self, user_id, session_id, before_chat_id=None, page_size=20):
+        """
+        chat_id 기준 keyset pagination으로 대화 내역의 한 페이지만 조회
+        before_chat_id: 이 chat_id보다 이전 메세지만 조회. None이면 가장 최근 메세지부터
+        page_size: 한 번에 가져올 메세지 수
+        Returns:
+            (rows, has_more): chat_id 오름차순으로 정렬된 페이지, 더 이전 메세지가 남아있는지 여부
+        """
+        # 서버 측 cursor로 (user_id, session_id, chat_id) 인덱스를 역순으로 page_size+1개만 읽음
+        self.connect(pymysql.cursors.SSCursor)
+        sql = """
+        SELECT * FROM chat_log
+        WHERE user_id = %s AND session_id = %s
+        """
+        values = [user_id, session_id]
+        if before_chat_id is not None:
+            sql += "AND chat_id < %s\n"
+            values.append(before_chat_id)
+        sql += "ORDER BY chat_id DESC LIMIT %s"
+        values.append(page_size + 1)
+        try:
+            self.cursor.execute(sql, values)
+            rows = [row for row in self.cursor]
+            has_more = len(rows) > page_size
+            return list(reversed(rows[:page_size])), has_more
+        except pymysql.MySQLError as e:
+            print(f">>> MySQL Error: {e}")
+            return [], False
+        finally:
+            self.close()
@@ -0,0 +1,129 @@
+from model.reranker import LexicalOverlapReranker
+from collections import OrderedDict
+import threading
+
+class ConversationalRetriever:
+    """
+    대화(session)별로 이전 검색에서 나온 후보 문서를 모아두고, 후속 질문이면 새로 검색(임베딩 API 호출)하지 않고
+    모아둔 후보를 다시 채점해 사용
+    - 후속 질문 판단: 질문의 문자 bigram 중 최근 질문과 후보 문서의 제목, 태그에 포함된 비율이 min_overlap 이상
+    - 재채점: 현재 질문만으로 후보를 어휘 겹침 순으로 정렬하고, retriever에 reranker가 있으면 그것으로 한 번 더 정렬
+    - 후속 질문인데 모아둔 후보로 부족하면 기준 질문(anchor_query)을 붙여 새로 검색
+    - 어휘가 겹치지 않아도 짧은 질문("그럼 아침은?")은 맥락이 생략된 후속 질문으로 보고, 후보를 재사용하지 않고 기준 질문을 붙여 새로 검색
+    - 그 외에는 질문만으로 검색하고 후보를 새로 모음
+    - retriever 버전이 바뀌면(HotSwapRetriever.reload) 이전 버전의 후보는 버림
+    """
+    def __init__(self, retriever, max_sessions=1000, pool_size=40, min_overlap=0.5, min_score=0.3, short_query_len=15):
+        """
+        retriever: search_candidates, rerank_candidates를 가진 검색기 (FAISSBM25Retriever, HotSwapRetriever)
+        max_sessions: 후보를 유지할 최대 대화 수. 넘으면 가장 오래 사용하지 않은 대화부터 삭제
+        pool_size: 대화별로 유지할 최대 후보 문서 수
+        min_overlap: 후속 질문으로 판단할 최소 어휘 겹침 비율
+        min_score: 재채점한 최상위 문서의 점수가 이보다 낮으면 새로 검색
+        short_query_len: 이 글자 수보다 짧은 질문은 어휘가 겹치지 않아도 기준 질문을 붙여 검색
+        """
+        self.retriever = retriever
+        self.max_sessions = max_sessions
+        self.pool_size = pool_size
+        self.min_overlap = min_overlap
+        self.min_score = min_score
+        self.short_query_len = short_query_len
+        self.max_queries = 5  # 후속 질문 판단에 사용할 최근 질문 수
+        self.lexical_scorer = LexicalOverlapReranker()
+        # session_key: {"version": 후보를 검색한 retriever 버전, "anchor_query": 후속 질문이 아닌 마지막 질문,
+        #               "queries": 최근 질문, "pool", "bigrams", "filters", "num_docs"}
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.num_pool_hits = 0
+        self.num_searches = 0
+
+    def _snapshot(self):
+        # HotSwapRetriever면 (version, retriever)를 한 번만 읽어 검색이 끝날 때까지 같은 버전 사용
+        snapshot = getattr(self.retriever, 'snapshot', None)
+        return snapshot() if snapshot else (None, self.retriever)
+
+    def search_docs(self, query, session_key, filters=None):
+        version, retriever = self._snapshot()
+        print(f">>> retriever 버전 {version}로 검색 (session {session_key})")
+        with self._lock:
+            state = self._sessions.get(session_key)
+            if state is not None and (state["version"] != version or state["filters"] != filters):
+                # 인덱스가 교체되었거나 검색 조건이 바뀌면 이전 후보는 사용하지 않음
+                del self._sessions[session_key]
+                state = None
+            elif state is not None:
+                self._sessions.move_to_end(session_key)
+
+        is_followup = state is not None and self._is_followup(query, state)
+        if is_followup:
+            retrieved_docs = self._search_pool(query, state, retriever)
+            if retrieved_docs:
+                with self._lock:
+                    self.num_pool_hits += 1
+                    state["queries"] = (state["queries"] + [query])[-self.max_queries:]
+                print(f">>> 이전 검색 후보 {len(state['pool'])}개에서 재사용 (session {session_key})")
+                return retrieved_docs
+
+        # 후속 질문이거나 맥락이 생략된 짧은 질문일 때만 기준 질문을 붙여 검색하고,
+        # 붙인 질문이나 짧은 질문은 다음 기준 질문으로 저장하지 않음
+        in_context = is_followup or (state is not None and len(query.strip()) < self.short_query_len)
+        search_query = f"{state['anchor_query']} {query}" if in_context else query
+        anchor_query = state["anchor_query"] if in_context else query
+        candidates = retriever.search_candidates(search_query, filters=filters)
+        retrieved_docs = retriever.rerank_candidates(search_query, candidates)
+        with self._lock:
+            self.num_searches += 1
+        self._update_pool(session_key, version, query, anchor_query, candidates, filters, len(retrieved_docs), keep_pool=in_context)
+        return retrieved_docs
+
+    def reset(self, session_key):
+        with self._lock:
+            self._sessions.pop(session_key, None)
+
+    def _is_followup(self, query, state):
+        query_bigrams = self.lexical_scorer.bigrams(query)
+        if not query_bigrams:
+            return False
+        return len(query_bigrams & state["bigrams"]) / len(query_bigrams) >= self.min_overlap
+
+    def _search_pool(self, query, state, retriever):
+        pool = state["pool"]
+        if not pool:
+            return None
+        # 이전 질문을 붙이면 이전 주제의 bigram 때문에 점수가 부풀려지므로 현재 질문만으로 채점
+        scores = self.lexical_scorer.score(query, [doc.page_content for doc in pool])
+        if max(scores) < self.min_score:
+            return None
+        ranked_pool = [pool[i] for i in sorted(range(len(pool)), key=lambda i: (-scores[i], i))]
+        return retriever.rerank_candidates(query, ranked_pool)[:state["num_docs"]]
+
+    def _update_pool(self, session_key, version, query, anchor_query, candidates, filters, num_docs, keep_pool):
+        """
+        keep_pool: 같은 대화 맥락의 질문이면 기존 후보에 새 후보를 더하고, 아니면 새 후보로 교체
+        """
+        with self._lock:
+            state = self._sessions.get(session_key)
+            if state is None or not keep_pool or state["version"] != version or state["filters"] != filters:
+                state = {"version": version, "queries": [], "pool": [], "bigrams": set(), "filters": filters}
+            # 새 후보를 앞에 두고, 같은 문서는 한 번만 유지
+            seen = set()
+            pool = []
+            for doc in candidates + state["pool"]:
+                key = (doc.metadata.get('source_url'), doc.page_content)
+                if key not in seen:
+                    seen.add(key)
+                    pool.append(doc)
+            state["pool"] = pool[:self.pool_size]
+            state["anchor_query"] = anchor_query
+            state["queries"] = (state["queries"] + [query])[-self.max_queries:]
+            state["num_docs"] = max(num_docs, 1)
+            # 후속 질문 판단에는 본문 대신 이전 질문과 후보 문서의 제목, 태그만 사용 (본문은 흔한 bigram이 많아 대부분 겹침)
+            texts = list(state["queries"])
+            for doc in state["pool"]:
+                texts.append(doc.metadata.get('title') or '')
+                texts += doc.metadata.get('tags') or []
+            state["bigrams"] = set().union(*(self.lexical_scorer.bigrams(text) for text in texts))
+            self._sessions[session_key] = state
+            self._sessions.move_to_end(session_key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
@@ -3,7 +3,7 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.chat_history import InMemoryChatMessageHistory
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain.memory import ConversationBufferMemory
-from preprocessor.image import get_resized_img, encode_bytesio_to_base64
+from model.session_store import SessionStore
 
 class BaseOpenAIChain():
     def __init__(self, messages, api_key, model='gpt-4o'):
@@ -13,34 +13,64 @@ class BaseOpenAIChain():
         prompt = ChatPromptTemplate.from_messages(messages)
         model = ChatOpenAI(model=model, api_key=api_key)
         self.chain = prompt | model
+        # 응답별 토큰 사용량. cached_tokens는 OpenAI prompt caching으로 재사용된 입력 토큰 수
+        self.last_usage = None
+        self.total_usage = {"requests": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0}
     
     def get_response(self, message_inputs):
         """
         message_inputs: messages에 포함된 input key와 해당하는 내용 쌍의 dict {"user_query": query}
         """
         response = self.chain.invoke(message_inputs)
+        self.record_usage(response)
         return response.content
+
+    def record_usage(self, response):
+        usage_metadata = getattr(response, 'usage_metadata', None) or {}
+        cached_tokens = (usage_metadata.get('input_token_details') or {}).get('cache_read')
+        if cached_tokens is None:
+            # usage_metadata에 캐시 정보가 없는 langchain-openai 버전은 원본 응답의 token_usage에서 확인
+            token_usage = response.response_metadata.get('token_usage') or {}
+            cached_tokens = (token_usage.get('prompt_tokens_details') or {}).get('cached_tokens', 0)
+        self.last_usage = {
+            "input_tokens": usage_metadata.get('input_tokens', 0),
+            "cached_tokens": cached_tokens or 0,
+            "output_tokens": usage_metadata.get('output_tokens', 0),
+        }
+        self.total_usage["requests"] += 1
+        for key, value in self.last_usage.items():
+            self.total_usage[key] += value
+        print(f">>> 토큰 사용량: 입력 {self.last_usage['input_tokens']} (캐시 {self.last_usage['cached_tokens']}), "
+              f"출력 {self.last_usage['output_tokens']}")
     
 class RAGChain(BaseOpenAIChain):
-    def __init__(self, prompt_messages, api_key, model='gpt-4o'):
+    def __init__(self, prompt_messages, api_key, model='gpt-4o', session_store=None):
+        """
+        session_store: 대화 기록을 보관할 SessionStore. 여러 chain이 공유할 수 있으며, None이면 이 chain 전용으로 생성
+        """
         super().__init__(prompt_messages, api_key)
-        self.session_storage = {}
+        self.session_store = session_store or SessionStore()
+        self.session_ids = set()  # 이 chain에서 사용한 session. reset_storage에서 삭제
     
     def get_session_history(self, session_id: str) -> InMemoryChatMessageHistory:
-        if session_id not in self.session_storage:
-            self.session_storage[session_id] = InMemoryChatMessageHistory()
-            return self.session_storage[session_id]
+        self.session_ids.add(session_id)
+        history = self.session_store.get(session_id)
+        if history is None:
+            history = InMemoryChatMessageHistory()
+            self.session_store.put(session_id, history)
+            return history
         
         # memory 객체로 불러오기
         memory = ConversationBufferMemory(
-            chat_memory=self.session_storage[session_id],
+            chat_memory=history,
             return_messages=True,
         )
         assert len(memory.memory_variables) == 1    # 메모리에 저장된 변수가 하나인지 확인
         key = memory.memory_variables[0]
         messages = memory.load_memory_variables({})[key]
-        self.session_storage[session_id] = InMemoryChatMessageHistory(messages=messages)
-        return self.session_storage[session_id]
+        history = InMemoryChatMessageHistory(messages=messages)
+        self.session_store.put(session_id, history)
+        return history
 
     def get_response(self, message_inputs, session_id):
         with_msg_history = RunnableWithMessageHistory(
@@ -49,14 +79,35 @@ class RAGChain(BaseOpenAIChain):
             input_messages_key="query",  # 최신 입력 메세지로 처리되는 키
             history_messages_key="chat_history" # 이전 메세지를 추가할 키
         )
-        response = with_msg_history.invoke(
-            message_inputs,
-            config={"configurable": {"session_id": session_id}}
-        )
+        # 응답이 대화 기록에 추가될 때까지 session이 메모리에서 밀려나지 않도록 고정
+        with self.session_store.pinned(session_id):
+            response = with_msg_history.invoke(
+                message_inputs,
+                config={"configurable": {"session_id": session_id}}
+            )
+            # 응답까지 추가된 대화 기록 크기로 메모리 사용량 갱신
+            self.session_store.touch(session_id)
+        self.record_usage(response)
         return response.content
 
+    def get_batch_responses(self, message_inputs_list, max_concurrency=4):
+        """
+        대화 기록 없이 여러 질문에 대한 응답을 동시에 최대 max_concurrency개씩 생성
+        message_inputs_list: get_response의 message_inputs 리스트
+        Returns:
+            list: 입력 순서대로 응답 문자열 혹은 실패한 경우 Exception
+        """
+        inputs = [{"chat_history": [], **message_inputs} for message_inputs in message_inputs_list]
+        responses = self.chain.batch(inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True)
+        for response in responses:
+            if not isinstance(response, Exception):
+                self.record_usage(response)
+        return [response if isinstance(response, Exception) else response.content for response in responses]
+
     def reset_storage(self):
-        self.session_storage = {}
+        for session_id in self.session_ids:
+            self.session_store.delete(session_id)
+        self.session_ids = set()
 
 class ImageDescriptionChain(BaseOpenAIChain):
     def __init__(self, system_prompt, api_key, model='gpt-4o'):
@@ -71,12 +122,15 @@ class ImageDescriptionChain(BaseOpenAIChain):
         super().__init__(messages, api_key=api_key, model=model)
 
     def get_response(self, user_query, image_file):
-        resized_img = get_resized_img(image_file)
-        encoded_img = encode_bytesio_to_base64(resized_img)
+        # PIL은 이미지 처리(크롤링)에서만 필요하므로 이 때 import
+        from preprocessor.image import get_encoded_img
+        # 같은 내용의 이미지는 리사이즈, 인코딩 결과를 캐시에서 재사용
+        encoded_img = get_encoded_img(image_file)
         message_query_dict = {
             "user_query": user_query,
             "image_data": encoded_img
         }
         response = self.chain.invoke(message_query_dict)
+        self.record_usage(response)
         return response.content
         
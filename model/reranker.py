@@ -0,0 +1,76 @@
+import time
+import re
+
+class BaseReranker:
+    """
+    병합된 후보 문서를 query와의 관련도로 다시 정렬
+    제한 시간(budget_ms)을 넘기면 남은 문서를 채점하지 않고 병합 순서 그대로 반환
+    """
+    batch_size = 1  # 제한 시간을 확인하는 단위
+
+    def score(self, query, texts):
+        """
+        texts의 각 문서에 대한 관련도 점수 리스트 반환 (클수록 관련도 높음)
+        """
+        raise NotImplementedError("Subclasses should implement this method.")
+
+    def rerank(self, query, docs, top_n, budget_ms=None):
+        deadline = time.perf_counter() + budget_ms / 1000 if budget_ms else None
+        scores = []
+        for start in range(0, len(docs), self.batch_size):
+            if deadline and time.perf_counter() > deadline:
+                print(f">>> rerank 제한 시간({budget_ms}ms) 초과: 병합 순서로 반환")
+                return docs[:top_n]
+            batch = docs[start:start + self.batch_size]
+            scores += self.score(query, [doc.page_content for doc in batch])
+        # 점수가 같으면 병합 순서 유지
+        ranked = sorted(range(len(docs)), key=lambda i: (-scores[i], i))
+        return [docs[i] for i in ranked[:top_n]]
+
+class LexicalOverlapReranker(BaseReranker):
+    """
+    query의 문자 bigram이 문서에 얼마나 포함되는지로 채점. 모델 없이 CPU에서 바로 동작
+    한국어는 조사가 붙어 단어 단위로 잘 맞지 않으므로 공백을 제외한 문자 bigram 사용
+    """
+    batch_size = 8
+
+    @staticmethod
+    def bigrams(text):
+        # 문장부호는 공백으로 바꾼 뒤 어절별 문자 bigram 생성 (한 글자 어절은 그대로 사용)
+        bigrams = set()
+        for token in re.sub(r'[^\w\s]', ' ', text).split():
+            if len(token) == 1:
+                bigrams.add(token)
+            for i in range(len(token) - 1):
+                bigrams.add(token[i:i + 2])
+        return bigrams
+
+    def score(self, query, texts):
+        query_bigrams = self.bigrams(query)
+        if not query_bigrams:
+            return [0.0] * len(texts)
+        return [len(query_bigrams & self.bigrams(text)) / len(query_bigrams) for text in texts]
+
+class CrossEncoderReranker(BaseReranker):
+    """
+    sentence-transformers의 CrossEncoder로 채점. 로컬에 받아둔 모델 경로를 주면 오프라인에서 CPU로 동작
+    """
+    batch_size = 8
+
+    def __init__(self, model_name_or_path, max_length=512):
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name_or_path, max_length=max_length, device='cpu')
+
+    def score(self, query, texts):
+        return [float(score) for score in self.model.predict([(query, text) for text in texts])]
+
+def load_reranker(spec):
+    """
+    spec: None 혹은 ''이면 rerank하지 않음, 'lexical'이면 LexicalOverlapReranker,
+          그 외에는 CrossEncoder 모델 이름 혹은 로컬 경로로 간주
+    """
+    if not spec:
+        return None
+    if spec == 'lexical':
+        return LexicalOverlapReranker()
+    return CrossEncoderReranker(spec)
@@ -1,28 +1,188 @@
-from langchain_community.retrievers import BM25Retriever
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain.retrievers import EnsembleRetriever
+# langchain_community, FAISS 등 무거운 모듈은 retriever를 실제로 생성하거나 검색할 때 import
+
+EMBEDDING_MODEL = "text-embedding-3-large"
+
+class MetadataIndex:
+    """
+    crawler가 생성한 metadata(title, author, source_url, tags)의 역색인
+    {field: {value: set(문서 위치)}} 형태로, 문서 위치는 docs_list의 순서(= FAISS/BM25 내부 위치)와 같음
+    """
+    FIELDS = ("title", "author", "source_url", "tags")
+
+    def __init__(self, docs_list):
+        self.index = {field: {} for field in self.FIELDS}
+        for position, doc in enumerate(docs_list):
+            for field in self.FIELDS:
+                values = doc.metadata.get(field)
+                if values is None:
+                    continue
+                if not isinstance(values, list):
+                    values = [values]
+                for value in values:
+                    self.index[field].setdefault(value, set()).add(position)
+
+    def values(self, field):
+        # 필터에 사용할 수 있는 값 목록
+        return sorted(self.index[field].keys())
+
+    def lookup(self, filters):
+        """
+        filters: {"author": "서울아산병원", "tags": ["당뇨", "식사요법"]} 형식의 dict
+                 field끼리는 AND, 한 field 안의 여러 값은 OR로 처리
+        Returns:
+            set: 조건을 만족하는 문서 위치
+        """
+        candidates = None
+        for field, values in filters.items():
+            if field not in self.index:
+                raise ValueError(f"지원하지 않는 metadata 필드입니다: {field}")
+            if not isinstance(values, (list, tuple, set)):
+                values = [values]
+            matched = set()
+            for value in values:
+                matched |= self.index[field].get(value, set())
+            candidates = matched if candidates is None else candidates & matched
+        return candidates if candidates is not None else set()
 
 class FAISSBM25Retriever:
-    def __init__(self, docs_list, openai_api_key, top_k=1):
+    def __init__(self, docs_list, openai_api_key, top_k=1, faiss_vectorstore=None, weights=(0.5, 0.5), embedding=None,
+                 reranker=None, candidate_k=20, rerank_budget_ms=50):
+        """
+        faiss_vectorstore: 이미 임베딩된 FAISS vectorstore. 주어지면 docs_list를 새로 임베딩하지 않음 (load에서 사용)
+        weights: (FAISS, BM25) 결과 병합 가중치
+        embedding: 사용할 embeddings 객체. None이면 OpenAIEmbeddings 생성 (평가 시 캐시된 임베딩 주입에 사용)
+        reranker: model.reranker의 reranker. 주어지면 검색기별로 candidate_k개를 가져와 병합한 뒤 top_k개로 rerank
+        rerank_budget_ms: rerank 제한 시간. 넘기면 병합 순서로 top_k개 반환
+        """
+        from langchain_community.retrievers import BM25Retriever
+        from langchain_openai import OpenAIEmbeddings
+        from langchain_community.vectorstores import FAISS
+        from langchain.retrievers import EnsembleRetriever
+
+        self.docs_list = docs_list
+        self.top_k = top_k
+        self.reranker = reranker
+        self.rerank_budget_ms = rerank_budget_ms
+        # rerank할 때만 후보를 넓게 가져옴
+        self.search_k = max(candidate_k, top_k) if reranker else top_k
+
         # BM25 검색기 설정
         bm25_retriever = BM25Retriever.from_documents(docs_list)
-        bm25_retriever.k = top_k
+        bm25_retriever.k = self.search_k
+        self.bm25_retriever = bm25_retriever
 
         # FAISS 검색기 설정
-        embedding = OpenAIEmbeddings(model="text-embedding-3-large", api_key=openai_api_key)
-        faiss_vectorstore = FAISS.from_documents(
-            documents=docs_list,
-            embedding=embedding
-        )
-        faiss_retriever = faiss_vectorstore.as_retriever(search_kwargs={"k":top_k})
+        self.embedding = embedding or OpenAIEmbeddings(model=EMBEDDING_MODEL, api_key=openai_api_key)
+        if faiss_vectorstore is None:
+            faiss_vectorstore = FAISS.from_documents(
+                documents=docs_list,
+                embedding=self.embedding
+            )
+        self.faiss_vectorstore = faiss_vectorstore
+        faiss_retriever = faiss_vectorstore.as_retriever(search_kwargs={"k":self.search_k})
 
         # Ensemble 검색기 생성
         self.retriever = EnsembleRetriever(
         retrievers=[faiss_retriever, bm25_retriever], # 순차적으로 전달
-        weights=[0.5, 0.5]
+        weights=list(weights)
         )
-    
-    def search_docs(self, query):
-        retrieved_docs = self.retriever.invoke(query)
-        return retrieved_docs
\ No newline at end of file
+
+        # metadata 역색인 생성
+        self.metadata_index = MetadataIndex(docs_list)
+
+    def save(self, path):
+        # FAISS 인덱스와 docstore를 저장. BM25와 metadata 역색인은 load 시 docstore의 문서로 다시 생성
+        self.faiss_vectorstore.save_local(path)
+
+    @classmethod
+    def load(cls, path, openai_api_key, top_k=1, **kwargs):
+        """
+        kwargs: reranker, candidate_k 등 생성자에 그대로 전달할 검색 옵션
+        """
+        from langchain_openai import OpenAIEmbeddings
+        from langchain_community.vectorstores import FAISS
+
+        embedding = OpenAIEmbeddings(model=EMBEDDING_MODEL, api_key=openai_api_key)
+        # 직접 생성한 인덱스 파일만 불러오므로 pickle 역직렬화 허용
+        faiss_vectorstore = FAISS.load_local(path, embedding, allow_dangerous_deserialization=True)
+        # FAISS 내부 위치 순서대로 문서를 꺼내 docs_list와 위치를 맞춤
+        index_to_id = faiss_vectorstore.index_to_docstore_id
+        docs_list = [faiss_vectorstore.docstore.search(index_to_id[position]) for position in range(len(index_to_id))]
+        return cls(docs_list, openai_api_key, top_k=top_k, faiss_vectorstore=faiss_vectorstore, **kwargs)
+
+    def search_docs(self, query, filters=None):
+        """
+        filters: MetadataIndex.lookup 형식의 metadata 조건. 주어지면 해당 문서만 후보로 두고 검색
+        """
+        return self.rerank_candidates(query, self.search_candidates(query, filters=filters))
+
+    def search_candidates(self, query, filters=None):
+        """
+        rerank 전 FAISS와 BM25 결과를 병합한 후보 문서 반환. reranker가 없으면 search_docs와 같음
+        """
+        if not filters:
+            return self.retriever.invoke(query)
+        candidates = sorted(self.metadata_index.lookup(filters))
+        if not candidates:
+            return []
+        query_vector = self.embedding.embed_query(query)
+        faiss_docs = self._search_faiss_vectors([query_vector], candidates)[0]
+        bm25_docs = self._search_bm25_in(query, candidates)
+        # EnsembleRetriever와 같은 가중치로 두 결과를 병합
+        return self.retriever.weighted_reciprocal_rank([faiss_docs, bm25_docs])
+
+    def search_docs_batch(self, queries, filters=None):
+        """
+        여러 query를 한 번에 검색
+        query 임베딩을 한 번의 API 호출로 만들고, FAISS는 (query 수 x 차원) 행렬로 한 번에 검색
+        Returns:
+            list: query별 검색 결과 리스트
+        """
+        candidates = None
+        if filters:
+            candidates = sorted(self.metadata_index.lookup(filters))
+            if not candidates:
+                return [[] for _ in queries]
+        query_vectors = self.embedding.embed_documents(list(queries))
+        faiss_results = self._search_faiss_vectors(query_vectors, candidates)
+
+        results = []
+        for query, faiss_docs in zip(queries, faiss_results):
+            if candidates is None:
+                bm25_docs = self.bm25_retriever.invoke(query)
+            else:
+                bm25_docs = self._search_bm25_in(query, candidates)
+            retrieved_docs = self.retriever.weighted_reciprocal_rank([faiss_docs, bm25_docs])
+            results.append(self.rerank_candidates(query, retrieved_docs))
+        return results
+
+    def rerank_candidates(self, query, retrieved_docs):
+        # reranker가 있으면 후보 문서를 top_k개로 rerank, 없으면 그대로 반환
+        if self.reranker:
+            retrieved_docs = self.reranker.rerank(query, retrieved_docs, top_n=self.top_k, budget_ms=self.rerank_budget_ms)
+        return retrieved_docs
+
+    def _search_faiss_vectors(self, query_vectors, candidates=None):
+        """
+        임베딩된 query 행렬로 FAISS 검색
+        candidates가 주어지면 해당 문서 위치만 검색하도록 FAISS에 IDSelector를 전달 (검색 후 필터링이 아닌 검색 중 필터링)
+        """
+        import numpy as np
+        import faiss
+        query_matrix = np.array(query_vectors, dtype=np.float32)
+        if candidates is None:
+            k = min(self.search_k, self.faiss_vectorstore.index.ntotal)
+            _, positions = self.faiss_vectorstore.index.search(query_matrix, k)
+        else:
+            selector = faiss.IDSelectorBatch(np.array(candidates, dtype=np.int64))
+            params = faiss.SearchParameters(sel=selector)
+            k = min(self.search_k, len(candidates))
+            _, positions = self.faiss_vectorstore.index.search(query_matrix, k, params=params)
+        return [[self.docs_list[position] for position in row if position != -1] for row in positions]
+
+    def _search_bm25_in(self, query, candidates):
+        # 후보 문서에 대해서만 BM25 점수 계산
+        tokenized_query = self.bm25_retriever.preprocess_func(query)
+        scores = self.bm25_retriever.vectorizer.get_batch_scores(tokenized_query, candidates)
+        ranked = sorted(zip(candidates, scores), key=lambda x: x[1], reverse=True)
+        return [self.docs_list[position] for position, _ in ranked[:self.search_k]]
@@ -0,0 +1,84 @@
+from datetime import datetime
+import threading
+
+class HotSwapRetriever:
+    """
+    retriever를 버전 단위로 관리하면서, 새 버전을 백그라운드 스레드에서 만든 뒤 교체
+    검색 요청은 시작 시점의 버전을 참조한 채로 끝까지 실행되므로, 교체 중에도 기존 검색이 끊기지 않음
+    """
+    def __init__(self, build_fn):
+        """
+        build_fn: 인자 없이 호출하면 새 retriever(search_docs를 가진 객체)를 반환하는 함수
+        """
+        self.build_fn = build_fn
+        self._build_lock = threading.Lock()  # 동시에 하나의 빌드만 실행
+        self._build_thread = None
+        self.last_error = None
+        self._active = self._build()  # (version, retriever) 쌍을 하나의 참조로 관리
+        print(f">>> retriever 버전 {self.version} 사용 시작")
+
+    def _build(self):
+        version = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        print(f">>> retriever 버전 {version} 생성 중")
+        return version, self.build_fn()
+
+    @property
+    def version(self):
+        return self._active[0]
+
+    @property
+    def current(self):
+        return self._active[1]
+
+    @property
+    def metadata_index(self):
+        return self.current.metadata_index
+
+    def snapshot(self):
+        """
+        현재 (version, retriever) 쌍 반환. 여러 단계로 나눠 검색할 때 같은 버전을 계속 사용하기 위해 사용
+        """
+        return self._active
+
+    def search_docs(self, query, **kwargs):
+        # 참조를 한 번만 읽어 검색 도중 교체되어도 같은 버전으로 검색
+        version, retriever = self._active
+        print(f">>> retriever 버전 {version}로 검색")
+        return retriever.search_docs(query, **kwargs)
+
+    def search_candidates(self, query, **kwargs):
+        version, retriever = self._active
+        print(f">>> retriever 버전 {version}로 후보 검색")
+        return retriever.search_candidates(query, **kwargs)
+
+    def rerank_candidates(self, query, retrieved_docs):
+        version, retriever = self._active
+        print(f">>> retriever 버전 {version}로 rerank")
+        return retriever.rerank_candidates(query, retrieved_docs)
+
+    def is_reloading(self):
+        return self._build_thread is not None and self._build_thread.is_alive()
+
+    def reload(self):
+        """
+        새 retriever를 백그라운드에서 생성한 후 교체. 이미 생성 중이면 False 반환
+        """
+        if not self._build_lock.acquire(blocking=False):
+            return False
+        self._build_thread = threading.Thread(target=self._reload, daemon=True)
+        self._build_thread.start()
+        return True
+
+    def _reload(self):
+        try:
+            active = self._build()
+            previous_version = self.version
+            # 참조 교체는 원자적으로 일어나며, 이전 버전은 진행 중인 검색이 끝나면 GC로 정리됨
+            self._active = active
+            self.last_error = None
+            print(f">>> retriever 버전 교체: {previous_version} -> {active[0]}")
+        except Exception as e:
+            self.last_error = e
+            print(f">>> retriever 버전 생성 실패, 기존 버전 {self.version} 유지: {e}")
+        finally:
+            self._build_lock.release()
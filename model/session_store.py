@@ -0,0 +1,188 @@
+from langchain_core.chat_history import InMemoryChatMessageHistory
+from langchain_core.messages import messages_from_dict, messages_to_dict
+from collections import OrderedDict
+from contextlib import contextmanager
+import threading
+import sqlite3
+import json
+import time
+import os
+
+class SQLiteSessionBackend:
+    """
+    SessionStore에서 밀려난 대화 기록을 저장하는 SQLite 저장소
+    max_age초 동안 갱신되지 않은 기록은 불러오지 않고, save 시 최대 prune_interval초마다 한 번씩 삭제
+    """
+    def __init__(self, path='./res/sessions/session_history.sqlite3', max_age=7 * 24 * 60 * 60, prune_interval=10 * 60):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_age = max_age
+        self.prune_interval = prune_interval
+        self._last_prune = 0
+        # 여러 Streamlit 스레드에서 접근하므로 lock으로 직렬화
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS session_history (
+                session_id TEXT PRIMARY KEY,
+                messages TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """)
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_session_history_updated_at ON session_history (updated_at)")
+            self.connection.commit()
+        self.prune()
+
+    def save(self, session_id, messages):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO session_history (session_id, messages, updated_at) VALUES (?, ?, ?)",
+                (session_id, json.dumps(messages_to_dict(messages), ensure_ascii=False), time.time())
+            )
+            self.connection.commit()
+        if time.time() - self._last_prune > self.prune_interval:
+            self.prune()
+
+    def prune(self):
+        # 오래 사용하지 않아 다시 불러올 일이 없는 대화 기록 삭제
+        with self.lock:
+            self._last_prune = time.time()
+            deleted = self.connection.execute(
+                "DELETE FROM session_history WHERE updated_at < ?", (self._last_prune - self.max_age,)
+            ).rowcount
+            self.connection.commit()
+        if deleted:
+            print(f">>> 오래된 대화 기록 {deleted}개를 session backend에서 삭제")
+
+    def load(self, session_id):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT messages FROM session_history WHERE session_id = ? AND updated_at >= ?",
+                (session_id, time.time() - self.max_age)
+            ).fetchone()
+        return messages_from_dict(json.loads(row[0])) if row else None
+
+    def delete(self, session_id):
+        with self.lock:
+            self.connection.execute("DELETE FROM session_history WHERE session_id = ?", (session_id,))
+            self.connection.commit()
+
+    def clear(self):
+        with self.lock:
+            self.connection.execute("DELETE FROM session_history")
+            self.connection.commit()
+
+class SessionStore:
+    """
+    session_id별 InMemoryChatMessageHistory를 메모리 한도 안에서 관리
+    - idle_ttl초 동안 사용하지 않은 session과, max_sessions개 혹은 max_bytes를 넘을 때 가장 오래 사용하지 않은 session부터 밀어냄
+    - backend가 있으면 밀려난 session을 backend에 저장하고, 다시 요청될 때 불러옴
+    - 응답 생성 중인 session은 pinned로 표시해 밀어내지 않음 (응답이 추가되기 전의 기록만 저장되는 것을 방지)
+    """
+    def __init__(self, max_sessions=1000, idle_ttl=60 * 60, max_bytes=64 * 1024 * 1024, backend=None):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.backend = backend
+        self._sessions = OrderedDict()  # session_id: (history, 마지막 사용 시각). 오래 사용하지 않은 순서
+        self._sizes = {}
+        self._total_bytes = 0
+        self._pins = {}  # session_id: 응답 생성 중인 요청 수
+        self._lock = threading.RLock()
+        self.num_evicted = 0
+
+    @staticmethod
+    def estimate_bytes(history):
+        # 메세지 내용의 UTF-8 크기로 메모리 사용량을 근사
+        return sum(len(str(message.content).encode('utf-8')) for message in history.messages)
+
+    @property
+    def memory_bytes(self):
+        return self._total_bytes
+
+    def _set_size(self, session_id, size):
+        self._total_bytes += size - self._sizes.get(session_id, 0)
+        self._sizes[session_id] = size
+
+    def _remove(self, session_id):
+        self._sessions.pop(session_id, None)
+        self._total_bytes -= self._sizes.pop(session_id, 0)
+
+    def stats(self):
+        with self._lock:
+            return {"sessions": len(self._sessions), "bytes": self.memory_bytes, "evicted": self.num_evicted}
+
+    def get(self, session_id):
+        """
+        session의 대화 기록 반환. 메모리에 없으면 backend에서 불러오고, 어디에도 없으면 None
+        """
+        with self._lock:
+            if session_id in self._sessions:
+                history = self._sessions[session_id][0]
+            elif self.backend and (messages := self.backend.load(session_id)) is not None:
+                history = InMemoryChatMessageHistory(messages=messages)
+                print(f">>> session {session_id} 대화 기록을 backend에서 불러옴")
+            else:
+                return None
+            self.put(session_id, history)
+            return history
+
+    def put(self, session_id, history):
+        with self._lock:
+            self._sessions[session_id] = (history, time.monotonic())
+            self._sessions.move_to_end(session_id)
+            self._set_size(session_id, self.estimate_bytes(history))
+            self._evict()
+
+    @contextmanager
+    def pinned(self, session_id):
+        """
+        with 블록 안에서는 session을 밀어내지 않음. 대화 기록을 읽고 응답을 추가하는 동안 사용
+        """
+        with self._lock:
+            self._pins[session_id] = self._pins.get(session_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pins[session_id] -= 1
+                if not self._pins[session_id]:
+                    del self._pins[session_id]
+                self._evict()
+
+    def touch(self, session_id):
+        # 대화 기록에 메세지가 추가된 뒤 사용 시각과 메모리 사용량 갱신
+        with self._lock:
+            if session_id in self._sessions:
+                self.put(session_id, self._sessions[session_id][0])
+
+    def delete(self, session_id):
+        with self._lock:
+            self._remove(session_id)
+            if self.backend:
+                self.backend.delete(session_id)
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+            self._sizes.clear()
+            self._total_bytes = 0
+            if self.backend:
+                self.backend.clear()
+
+    def _evict(self):
+        now = time.monotonic()
+        for session_id in list(self._sessions):
+            history, last_used = self._sessions[session_id]
+            expired = now - last_used > self.idle_ttl
+            over_limit = len(self._sessions) > self.max_sessions or (self.max_bytes and self.memory_bytes > self.max_bytes)
+            # 방금 사용한 session은 한도를 넘더라도 밀어내지 않음
+            if not (expired or over_limit) or (session_id == next(reversed(self._sessions)) and not expired):
+                break
+            if session_id in self._pins:
+                continue  # 응답 생성 중인 session은 건너뛰고 다음으로 오래된 session을 밀어냄
+            self._remove(session_id)
+            self.num_evicted += 1
+            if self.backend:
+                self.backend.save(session_id, history.messages)
+            print(f">>> session {session_id} 대화 기록을 메모리에서 내림 ({'idle' if expired else 'LRU'})")
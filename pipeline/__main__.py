@@ -0,0 +1,94 @@
+"""
+크롤링, 인덱싱 등 웹 요청 밖에서 실행할 작업의 CLI
+    python -m pipeline crawl [--sources amc-mealtherapy ssh-diabetes] [--force] [--workers N]
+    python -m pipeline build-index [--sources ...]
+    python -m pipeline verify [--query "당뇨 식단"]
+    python -m pipeline evaluate [--queries ./res/eval-queries.jsonl] [--chunk-sizes 300] [--overlaps 100] [--top-ks 2] [--faiss-weights 0.5] [--rerankers none lexical]
+    python -m pipeline batch-answer --input questions.txt --output answers.jsonl [--concurrency 4]
+    python -m pipeline import-report [--module app] [--top 20]
+"""
+from pipeline.crawl import crawl_parallel, get_crawl_tasks
+from pipeline.import_report import print_import_report
+from pipeline.sources import SOURCES
+from dotenv import load_dotenv
+import argparse
+import os
+import sys
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m pipeline")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    crawl_parser = subparsers.add_parser("crawl", help="소스별로 병렬 크롤링 후 res의 json문서 업데이트")
+    crawl_parser.add_argument("--sources", nargs="+", choices=list(SOURCES.keys()), help="크롤링할 소스. 생략하면 전체")
+    crawl_parser.add_argument("--force", action="store_true", help="json문서가 있어도 새로 크롤링")
+    crawl_parser.add_argument("--workers", type=int, default=None, help="동시에 실행할 크롤러 프로세스 수. 생략하면 소스 수")
+
+    index_parser = subparsers.add_parser("build-index", help="json문서로 검색 인덱스 생성 후 ./res/index에 저장")
+    index_parser.add_argument("--sources", nargs="+", choices=list(SOURCES.keys()), help="인덱싱할 소스. 생략하면 전체")
+
+    verify_parser = subparsers.add_parser("verify", help="현재 검색 인덱스 검증")
+    verify_parser.add_argument("--query", default=None, help="검증용 검색어. 주어지면 실제로 검색 실행")
+
+    eval_parser = subparsers.add_parser("evaluate", help="검색 파라미터 조합별 품질(recall@k, MRR@k)과 속도 비교")
+    eval_parser.add_argument("--queries", default="./res/eval-queries.jsonl", help="평가용 질문 JSONL 파일")
+    eval_parser.add_argument("--sources", nargs="+", choices=list(SOURCES.keys()), help="평가에 사용할 소스. 생략하면 전체")
+    eval_parser.add_argument("--chunk-sizes", nargs="+", type=int, default=[300])
+    eval_parser.add_argument("--overlaps", nargs="+", type=int, default=[100])
+    eval_parser.add_argument("--top-ks", nargs="+", type=int, default=[2])
+    eval_parser.add_argument("--faiss-weights", nargs="+", type=float, default=[0.5], help="FAISS 가중치. BM25 가중치는 1-값")
+    eval_parser.add_argument("--rerankers", nargs="+", default=[None],
+                             help="비교할 reranker. 'none', 'lexical' 혹은 CrossEncoder 모델 경로")
+    eval_parser.add_argument("--candidate-k", type=int, default=20, help="rerank 시 검색기별 후보 문서 수")
+    eval_parser.add_argument("--output", default=None, help="결과를 저장할 CSV 경로")
+
+    batch_parser = subparsers.add_parser("batch-answer", help="질문 파일의 질문들에 일괄 응답 후 JSONL로 저장")
+    batch_parser.add_argument("--input", required=True, help="한 줄에 질문 하나인 텍스트 파일 혹은 question 필드를 가진 JSONL 파일")
+    batch_parser.add_argument("--output", required=True, help="결과 JSONL 경로")
+    batch_parser.add_argument("--concurrency", type=int, default=4, help="동시에 생성할 응답 수")
+    batch_parser.add_argument("--batch-size", type=int, default=64, help="한 번에 검색할 질문 수")
+    batch_parser.add_argument("--top-k", type=int, default=2, help="검색기별로 가져올 문서 수")
+
+    report_parser = subparsers.add_parser("import-report", help="모듈 import 시간 측정")
+    report_parser.add_argument("--module", default="app", help="측정할 모듈")
+    report_parser.add_argument("--top", type=int, default=20, help="출력할 모듈 수")
+
+    args = parser.parse_args()
+    load_dotenv()
+    openai_api_key = os.environ.get('OPENAI_API_KEY')
+
+    if args.command == "crawl":
+        failures = crawl_parallel(get_crawl_tasks(openai_api_key, args.sources), force_crawl=args.force, max_workers=args.workers)
+        if failures:
+            sys.exit(1)
+    elif args.command == "build-index":
+        from pipeline.index import build_index
+        build_index(openai_api_key, source_names=args.sources)
+    elif args.command == "verify":
+        from pipeline.index import verify_index
+        problems = verify_index(openai_api_key=openai_api_key, query=args.query)
+        for problem in problems:
+            print(f">>> {problem}")
+        if problems:
+            sys.exit(1)
+        print(">>> 인덱스 검증 완료")
+    elif args.command == "evaluate":
+        from pipeline.evaluate import evaluate, load_queries, print_results, save_results
+        reranker_specs = [None if spec in (None, 'none') else spec for spec in args.rerankers]
+        results = evaluate(load_queries(args.queries), openai_api_key, args.chunk_sizes, args.overlaps,
+                           args.top_ks, args.faiss_weights, source_names=args.sources,
+                           reranker_specs=reranker_specs, candidate_k=args.candidate_k)
+        print_results(results)
+        if args.output:
+            save_results(results, args.output)
+    elif args.command == "batch-answer":
+        from pipeline.batch import answer_batch, load_questions
+        num_failed = answer_batch(load_questions(args.input), args.output, openai_api_key, top_k=args.top_k,
+                                  concurrency=args.concurrency, batch_size=args.batch_size)
+        if num_failed:
+            sys.exit(1)
+    elif args.command == "import-report":
+        print_import_report(args.module, top=args.top)
+
+if __name__ == "__main__":
+    main()
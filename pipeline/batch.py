@@ -0,0 +1,71 @@
+from model.openai_langchain import RAGChain
+from model.prompts import RAG_PROMPT_MESSAGES
+from pipeline.index import build_retriever_from_paths, load_index
+from pipeline.sources import get_sources
+import json
+
+def load_questions(path):
+    """
+    질문 파일 로드
+    path: 한 줄에 질문 하나인 텍스트 파일, 혹은 한 줄에 {"id": ..., "question": "..."} 형식의 JSONL 파일
+    Returns:
+        list: {"id":, "question":} 리스트. id가 없으면 줄 번호 사용
+    """
+    questions = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for line_no, line in enumerate(file, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith('.jsonl'):
+                item = json.loads(line)
+                questions.append({"id": item.get("id", line_no), "question": item["question"]})
+            else:
+                questions.append({"id": line_no, "question": line})
+    return questions
+
+def load_retriever(openai_api_key, top_k, **retriever_kwargs):
+    # python -m pipeline build-index로 만든 인덱스를 사용하고, 없으면 소스 json문서로 생성
+    retriever = load_index(openai_api_key, top_k=top_k, **retriever_kwargs)
+    if retriever is None:
+        print(">>> 저장된 인덱스가 없어 인덱스를 생성합니다.")
+        save_paths = [source["save_path"] for source in get_sources().values()]
+        retriever = build_retriever_from_paths(save_paths, openai_api_key, top_k=top_k, **retriever_kwargs)
+    return retriever
+
+def answer_batch(questions, output_path, openai_api_key, top_k=2, concurrency=4, batch_size=64, **retriever_kwargs):
+    """
+    질문 목록에 대해 검색 및 응답 생성 후 JSONL로 저장
+    batch_size개씩 묶어 검색(한 번의 임베딩 호출 + FAISS 행렬 검색)하고, 응답은 최대 concurrency개씩 동시에 생성
+    Returns:
+        int: 응답 생성에 실패한 질문 수
+    """
+    retriever = load_retriever(openai_api_key, top_k, **retriever_kwargs)
+    rag_chain = RAGChain(RAG_PROMPT_MESSAGES, openai_api_key)
+
+    num_failed = 0
+    with open(output_path, 'w', encoding='utf-8') as file:
+        for start in range(0, len(questions), batch_size):
+            batch = questions[start:start + batch_size]
+            print(f">>> 질문 {start + 1}~{start + len(batch)} / {len(questions)} 처리 중")
+            retrieved_docs_list = retriever.search_docs_batch([item["question"] for item in batch])
+            responses = rag_chain.get_batch_responses(
+                [{"query": item["question"], "context": retrieved_docs}
+                 for item, retrieved_docs in zip(batch, retrieved_docs_list)],
+                max_concurrency=concurrency
+            )
+            for item, retrieved_docs, response in zip(batch, retrieved_docs_list, responses):
+                result = {
+                    "id": item["id"],
+                    "question": item["question"],
+                    "answer": None if isinstance(response, Exception) else response,
+                    "sources": [{"title": doc.metadata.get("title"), "source_url": doc.metadata.get("source_url")}
+                                for doc in retrieved_docs],
+                }
+                if isinstance(response, Exception):
+                    num_failed += 1
+                    result["error"] = str(response)
+                file.write(json.dumps(result, ensure_ascii=False) + '\n')
+            file.flush()
+    print(f">>> 저장 완료: {output_path} (실패 {num_failed}개)")
+    return num_failed
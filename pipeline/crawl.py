@@ -0,0 +1,75 @@
+from data_loader.data_saver import JsonSaver
+from pipeline.sources import get_sources
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import importlib
+import os
+
+def get_crawl_tasks(openai_api_key, names=None):
+    # 소스 레지스트리에서 api key 자리를 채운 crawl task 리스트 반환
+    tasks = []
+    for name, source in get_sources(names).items():
+        kwargs = {key: openai_api_key if value == "OPENAI_API_KEY" else value
+                  for key, value in source["kwargs"].items()}
+        tasks.append({**source, "name": name, "kwargs": kwargs})
+    return tasks
+
+def load_crawler(crawler_path):
+    # "package.module.ClassName" 형식의 경로에서 크롤러 클래스를 import
+    module_name, class_name = crawler_path.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), class_name)
+
+def crawl_and_save(crawler, save_path, force_crawl=False, **kwargs):
+    """
+    크롤러를 실행하고 JSON 파일로 저장
+    crawl_and_update에서 호출됨
+    crawler: 크롤러 클래스 혹은 load_crawler로 불러올 수 있는 클래스 경로
+    """
+    if os.path.exists(save_path) and not force_crawl:
+        print(f">>> 이미 존재하는 파일이 있습니다: {save_path} -> 새로 크롤링하지 않고 기존 데이터를 사용합니다.")
+        return
+
+    if isinstance(crawler, str):
+        crawler = load_crawler(crawler)
+    crawler_instance = crawler(**kwargs) if kwargs else crawler()
+    articles = crawler_instance.run()
+    json_saver = JsonSaver()
+    json_saver.save(save_path, articles)
+    print(f"저장 완료: {save_path}")
+
+def crawl_and_update(crawl_tasks, force_crawl:bool):
+    """
+    실행할 크롤러를 명시, res의 json문서들을 순서대로 업데이트
+    """
+
+    for task in crawl_tasks:
+        crawl_and_save(
+            task["crawler"],
+            task["save_path"],
+            force_crawl=force_crawl,
+            **task["kwargs"]
+        )
+
+def _run_crawl_task(task, force_crawl):
+    # 별도 프로세스에서 실행되므로 모듈 최상위 함수로 정의
+    crawl_and_save(task["crawler"], task["save_path"], force_crawl=force_crawl, **task["kwargs"])
+    return task["save_path"]
+
+def crawl_parallel(crawl_tasks, force_crawl:bool, max_workers=None):
+    """
+    소스별 크롤러를 각각의 프로세스(각자의 브라우저)에서 동시에 실행
+    Returns:
+        dict: 실패한 소스 이름과 에러. 모두 성공하면 빈 dict
+    """
+    failures = {}
+    max_workers = max_workers or len(crawl_tasks)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_run_crawl_task, task, force_crawl): task["name"] for task in crawl_tasks}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                future.result()
+                print(f">>> [{name}] 크롤링 완료")
+            except Exception as e:
+                failures[name] = e
+                print(f">>> [{name}] 크롤링 실패: {e}")
+    return failures
@@ -0,0 +1,147 @@
+from model.retriever import FAISSBM25Retriever, EMBEDDING_MODEL
+from model.reranker import load_reranker
+from pipeline.index import load_documents, split_documents
+from pipeline.sources import get_sources
+import itertools
+import json
+import time
+import csv
+
+EMBEDDING_CACHE_DIR = './res/embedding_cache'
+
+def load_queries(path):
+    """
+    평가용 질문 목록 로드
+    path: 한 줄에 {"query": "...", "relevant_urls": ["source_url", ...]} 형식의 JSONL 파일
+    """
+    queries = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                queries.append(json.loads(line))
+    return queries
+
+def get_cached_embedding(openai_api_key, cache_dir=EMBEDDING_CACHE_DIR):
+    # 같은 chunk나 질문은 한 번만 임베딩 API를 호출하도록 로컬 파일 캐시 사용
+    from langchain.embeddings import CacheBackedEmbeddings
+    from langchain.storage import LocalFileStore
+    from langchain_openai import OpenAIEmbeddings
+
+    underlying = OpenAIEmbeddings(model=EMBEDDING_MODEL, api_key=openai_api_key)
+    return CacheBackedEmbeddings.from_bytes_store(
+        underlying, LocalFileStore(cache_dir), namespace=EMBEDDING_MODEL, query_embedding_cache=True
+    )
+
+def score_retrieval(retrieved_docs, relevant_urls):
+    """
+    검색 결과 chunk의 source_url로 관련 문서 적중 여부 판단
+    Returns:
+        (recall, reciprocal_rank): 관련 문서 중 검색된 비율, 처음 적중한 순위의 역수
+    """
+    relevant_urls = set(relevant_urls)
+    found = set()
+    reciprocal_rank = 0.0
+    for rank, doc in enumerate(retrieved_docs, start=1):
+        url = doc.metadata.get('source_url')
+        if url in relevant_urls:
+            if not found:
+                reciprocal_rank = 1.0 / rank
+            found.add(url)
+    recall = len(found) / len(relevant_urls) if relevant_urls else 0.0
+    return recall, reciprocal_rank
+
+def percentile(values, p):
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[idx]
+
+def evaluate(queries, openai_api_key, chunk_sizes, overlaps, top_ks, faiss_weights, source_names=None, cache_dir=EMBEDDING_CACHE_DIR,
+             reranker_specs=(None,), candidate_k=20, rerank_budget_ms=None):
+    """
+    chunk_size, overlap, top_k, 병합 가중치, reranker 조합별로 검색 품질과 속도 측정
+    FAISS 인덱스는 (chunk_size, overlap)마다 한 번만 만들고 top_k, 가중치, reranker 조합에서 재사용
+    reranker_specs: model.reranker.load_reranker에 전달할 값 목록. None은 rerank하지 않음
+    Returns:
+        list: 조합별 결과 dict 리스트
+    """
+    import faiss
+
+    rerankers = {spec: load_reranker(spec) for spec in reranker_specs}
+    embedding = get_cached_embedding(openai_api_key, cache_dir)
+    sources = get_sources(source_names)
+    documents = load_documents([source["save_path"] for source in sources.values()])
+
+    # 실제 질문 처리 시간의 대부분인 임베딩 API 호출 시간은 캐시 없이 질문마다 한 번씩 따로 측정
+    embed_latencies = []
+    for item in queries:
+        start = time.perf_counter()
+        embedding.underlying_embeddings.embed_query(item["query"])
+        embed_latencies.append((time.perf_counter() - start) * 1000)
+    # 질문 임베딩을 미리 캐시에 올려, 조합별 검색 시간(search_p50_ms, search_p95_ms)은 API 호출을 제외한 로컬 검색만 측정
+    for item in queries:
+        embedding.embed_query(item["query"])
+
+    results = []
+    for chunk_size, overlap in itertools.product(chunk_sizes, overlaps):
+        if overlap >= chunk_size:
+            continue
+        print(f">>> chunk_size={chunk_size}, overlap={overlap} 인덱스 생성 중")
+        splitted_documents = split_documents(documents, chunk_size=chunk_size, overlap=overlap)
+        start = time.perf_counter()
+        base_retriever = FAISSBM25Retriever(splitted_documents, openai_api_key, embedding=embedding)
+        build_s = time.perf_counter() - start
+        index_bytes = faiss.serialize_index(base_retriever.faiss_vectorstore.index).nbytes
+
+        for top_k, faiss_weight, reranker_spec in itertools.product(top_ks, faiss_weights, reranker_specs):
+            retriever = FAISSBM25Retriever(splitted_documents, openai_api_key, top_k=top_k,
+                                           faiss_vectorstore=base_retriever.faiss_vectorstore,
+                                           weights=(faiss_weight, 1 - faiss_weight), embedding=embedding,
+                                           reranker=rerankers[reranker_spec], candidate_k=candidate_k,
+                                           rerank_budget_ms=rerank_budget_ms)
+            recalls, reciprocal_ranks, latencies, num_docs = [], [], [], []
+            for item in queries:
+                start = time.perf_counter()
+                retrieved_docs = retriever.search_docs(item["query"])
+                latencies.append((time.perf_counter() - start) * 1000)
+                # 병합 결과는 최대 2*top_k개이므로 상위 top_k개로 잘라 recall@k, MRR@k 계산
+                recall, reciprocal_rank = score_retrieval(retrieved_docs[:top_k], item["relevant_urls"])
+                recalls.append(recall)
+                reciprocal_ranks.append(reciprocal_rank)
+                num_docs.append(len(retrieved_docs))
+
+            results.append({
+                "chunk_size": chunk_size,
+                "overlap": overlap,
+                "top_k": top_k,
+                "weights": f"{faiss_weight:.2f}/{1 - faiss_weight:.2f}",
+                "reranker": reranker_spec or "-",
+                "recall_at_k": sum(recalls) / len(recalls),
+                "mrr_at_k": sum(reciprocal_ranks) / len(reciprocal_ranks),
+                "avg_docs": sum(num_docs) / len(num_docs),
+                "num_chunks": len(splitted_documents),
+                "index_mb": index_bytes / (1 << 20),
+                "build_s": build_s,
+                "search_p50_ms": percentile(latencies, 50),
+                "search_p95_ms": percentile(latencies, 95),
+                "embed_p50_ms": percentile(embed_latencies, 50),
+                "embed_p95_ms": percentile(embed_latencies, 95),
+            })
+    return results
+
+def print_results(results):
+    # recall_at_k, mrr_at_k는 반환된 문서(avg_docs개) 중 상위 top_k개 기준, build_s는 캐시에 없는 chunk의 임베딩 API 호출 시간을 포함
+    # search_*_ms는 캐시된 질문 임베딩으로 잰 로컬 검색 시간, embed_*_ms는 캐시 없이 잰 질문 임베딩 API 호출 시간 (모든 조합에 공통)
+    formats = {"recall_at_k": "{:.3f}", "mrr_at_k": "{:.3f}", "avg_docs": "{:.1f}", "index_mb": "{:.2f}", "build_s": "{:.2f}",
+               "search_p50_ms": "{:.1f}", "search_p95_ms": "{:.1f}", "embed_p50_ms": "{:.1f}", "embed_p95_ms": "{:.1f}"}
+    columns = list(results[0].keys())
+    rows = [[formats.get(name, "{}").format(result[name]) for name in columns] for result in results]
+    widths = [max(len(name), *(len(row[i]) for row in rows)) for i, name in enumerate(columns)]
+    print("  ".join(name.rjust(width) for name, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(cell.rjust(width) for cell, width in zip(row, widths)))
+
+def save_results(results, path):
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=list(results[0].keys()))
+        writer.writeheader()
+        writer.writerows(results)
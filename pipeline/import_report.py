@@ -0,0 +1,34 @@
+import subprocess
+import sys
+
+def get_import_times(module_name):
+    """
+    `python -X importtime`으로 module_name을 새 프로세스에서 import하고 모듈별 소요 시간을 수집
+    Returns:
+        list: (모듈명, self 시간(us), cumulative 시간(us)) 리스트
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{module_name} import 실패:\n{result.stderr}")
+
+    import_times = []
+    for line in result.stderr.splitlines():
+        # 형식: "import time:      self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        import_times.append((name.strip(), int(self_us), int(cumulative_us)))
+    return import_times
+
+def print_import_report(module_name, top=20):
+    import_times = get_import_times(module_name)
+    # 마지막 줄이 module_name 자체이며, cumulative에 하위 import가 모두 포함됨
+    total_us = import_times[-1][2] if import_times else 0
+    print(f">>> {module_name} import 시간: {total_us / 1000:.1f} ms")
+    print(f"{'cumulative(ms)':>15} {'self(ms)':>10}  module")
+    # 무거운 패키지를 찾기 쉽도록 cumulative 순으로 정렬
+    for name, self_us, cumulative_us in sorted(import_times, key=lambda x: x[2], reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>15.1f} {self_us / 1000:>10.1f}  {name}")
@@ -0,0 +1,152 @@
+from data_loader.data_saver import JsonSaver
+from data_loader.structured_data_loader import JsonLoader
+from model.retriever import FAISSBM25Retriever, EMBEDDING_MODEL
+from preprocessor.structured_data import json_to_langchain_doclist
+from pipeline.sources import get_sources
+from datetime import datetime
+import hashlib
+import os
+
+# 인덱스 산출물 구조
+# ./res/index/
+#   CURRENT            : 웹 앱이 불러올 버전 이름
+#   <version>/         : FAISS 인덱스(index.faiss, index.pkl)와 manifest.json
+INDEX_DIR = './res/index'
+CHUNK_SIZE = 300
+CHUNK_OVERLAP = 100
+
+def file_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def load_documents(save_paths):
+    # RAG 1. Load Data
+    json_loader = JsonLoader()
+    documents = []
+    for path in save_paths:
+        json_doc = json_loader.load(path)
+        documents += json_to_langchain_doclist(json_doc)
+    return documents
+
+def split_documents(documents, chunk_size, overlap):
+    # RAG 2. Split Documents
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=overlap, length_function=len)
+    split_result = text_splitter.split_documents(documents)
+    return split_result
+
+def build_retriever_from_paths(save_paths, openai_api_key, top_k, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP, **retriever_kwargs):
+    # RAG 1~3: json문서 로드, 분할, 임베딩 후 retriever 생성
+    documents = load_documents(save_paths)
+    splitted_documents = split_documents(documents, chunk_size=chunk_size, overlap=overlap)
+    return FAISSBM25Retriever(splitted_documents, openai_api_key, top_k=top_k, **retriever_kwargs)
+
+def get_current_version(index_dir=INDEX_DIR):
+    current_path = os.path.join(index_dir, 'CURRENT')
+    if not os.path.exists(current_path):
+        return None
+    with open(current_path, 'r') as file:
+        return file.read().strip()
+
+def set_current_version(version, index_dir=INDEX_DIR):
+    # 임시 파일에 쓴 뒤 교체해서, 읽는 쪽이 반쯤 쓰인 CURRENT를 보지 않도록 함
+    current_path = os.path.join(index_dir, 'CURRENT')
+    tmp_path = current_path + '.tmp'
+    with open(tmp_path, 'w') as file:
+        file.write(version)
+    os.replace(tmp_path, current_path)
+
+def build_index(openai_api_key, source_names=None, index_dir=INDEX_DIR, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """
+    소스 json문서로 인덱스를 만들어 새 버전 디렉토리에 저장한 뒤 CURRENT를 새 버전으로 변경
+    Returns:
+        str: 생성된 버전 이름
+    """
+    sources = get_sources(source_names)
+    missing = [source["save_path"] for source in sources.values() if not os.path.exists(source["save_path"])]
+    if missing:
+        raise FileNotFoundError(f"크롤링된 json문서가 없습니다. 먼저 python -m pipeline crawl을 실행하세요: {missing}")
+
+    version = datetime.now().strftime("%Y%m%d-%H%M%S")
+    version_dir = os.path.join(index_dir, version)
+    print(f">>> 인덱스 버전 {version} 생성 중")
+
+    documents = load_documents([source["save_path"] for source in sources.values()])
+    splitted_documents = split_documents(documents, chunk_size=chunk_size, overlap=overlap)
+    retriever = FAISSBM25Retriever(splitted_documents, openai_api_key)
+    os.makedirs(version_dir, exist_ok=True)
+    retriever.save(version_dir)
+
+    manifest = {
+        "version": version,
+        "created_at": datetime.now().isoformat(),
+        "embedding_model": EMBEDDING_MODEL,
+        "chunk_size": chunk_size,
+        "overlap": overlap,
+        "num_documents": len(documents),
+        "num_chunks": len(splitted_documents),
+        "sources": {
+            name: {"save_path": source["save_path"], "sha256": file_sha256(source["save_path"])}
+            for name, source in sources.items()
+        }
+    }
+    JsonSaver().save(os.path.join(version_dir, 'manifest.json'), manifest)
+    set_current_version(version, index_dir)
+    print(f">>> 인덱스 버전 {version} 저장 완료: 문서 {len(documents)}개, chunk {len(splitted_documents)}개")
+    return version
+
+def load_index(openai_api_key, top_k, index_dir=INDEX_DIR, **retriever_kwargs):
+    """
+    CURRENT가 가리키는 버전의 인덱스를 불러옴. 인덱스가 없으면 None
+    retriever_kwargs: reranker 등 FAISSBM25Retriever 검색 옵션
+    """
+    version = get_current_version(index_dir)
+    if version is None:
+        return None
+    print(f">>> 인덱스 버전 {version} 불러오는 중")
+    return FAISSBM25Retriever.load(os.path.join(index_dir, version), openai_api_key, top_k=top_k, **retriever_kwargs)
+
+def verify_index(index_dir=INDEX_DIR, openai_api_key=None, query=None):
+    """
+    CURRENT 인덱스의 manifest와 실제 인덱스, 소스 json문서가 일치하는지 확인
+    query가 주어지면 불러온 인덱스로 검색까지 실행 (임베딩 API 호출)
+    Returns:
+        list: 발견된 문제 목록. 문제가 없으면 빈 리스트
+    """
+    problems = []
+    version = get_current_version(index_dir)
+    if version is None:
+        return [f"{index_dir}/CURRENT가 없습니다. python -m pipeline build-index를 실행하세요."]
+    version_dir = os.path.join(index_dir, version)
+
+    for file_name in ['index.faiss', 'index.pkl', 'manifest.json']:
+        if not os.path.exists(os.path.join(version_dir, file_name)):
+            problems.append(f"{version_dir}에 {file_name}이 없습니다.")
+    if problems:
+        return problems
+
+    manifest = JsonLoader().load(os.path.join(version_dir, 'manifest.json'))
+    for name, source in manifest["sources"].items():
+        if not os.path.exists(source["save_path"]):
+            problems.append(f"[{name}] 소스 json문서가 없습니다: {source['save_path']}")
+        elif file_sha256(source["save_path"]) != source["sha256"]:
+            problems.append(f"[{name}] 인덱스 생성 후 소스 json문서가 변경되었습니다. build-index를 다시 실행하세요.")
+
+    # 인덱스를 불러와 chunk 수 확인 (임베딩 객체는 생성만 하고 호출하지 않음)
+    retriever = FAISSBM25Retriever.load(version_dir, openai_api_key or 'verify-only')
+    num_vectors = retriever.faiss_vectorstore.index.ntotal
+    if num_vectors != manifest["num_chunks"] or len(retriever.docs_list) != manifest["num_chunks"]:
+        problems.append(f"chunk 수 불일치: manifest {manifest['num_chunks']}개, "
+                        f"FAISS {num_vectors}개, docstore {len(retriever.docs_list)}개")
+
+    if query and not problems:
+        retrieved_docs = retriever.search_docs(query)
+        print(f">>> '{query}' 검색 결과 {len(retrieved_docs)}개")
+        for doc in retrieved_docs:
+            print(f"  - {doc.metadata.get('title')} ({doc.metadata.get('source_url')})")
+        if not retrieved_docs:
+            problems.append(f"'{query}' 검색 결과가 없습니다.")
+    return problems
@@ -0,0 +1,27 @@
+# 크롤링 대상 소스 목록
+# - crawler: 크롤러 클래스 경로. selenium 등을 불러오므로 실제로 크롤링할 때만 import
+# - save_path: 크롤링 결과 json문서 경로
+# - kwargs: 크롤러 생성 인자. 값이 OPENAI_API_KEY이면 실행 시 전달받은 key로 대체
+SOURCES = {
+    "amc-mealtherapy": {
+        "crawler": "crawler.healthcare_crawlers.AMCMealTherapyCrawler",
+        "save_path": './res/amc-mealtherapy.json',
+        "kwargs": {}
+    },
+    "ssh-diabetes": {
+        "crawler": "crawler.healthcare_crawlers.SSHDiabetesCrawler",
+        "save_path": './res/ssh-diabetes.json',
+        "kwargs": {"api_key": "OPENAI_API_KEY"}
+    },
+}
+
+def get_sources(names=None):
+    """
+    names: 사용할 소스 이름 리스트. None이면 전체
+    """
+    if names is None:
+        names = list(SOURCES.keys())
+    unknown = [name for name in names if name not in SOURCES]
+    if unknown:
+        raise ValueError(f"등록되지 않은 소스입니다: {unknown} (등록된 소스: {list(SOURCES.keys())})")
+    return {name: SOURCES[name] for name in names}
@@ -1,6 +1,11 @@
-import base64
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
 from PIL import Image
+import threading
+import hashlib
+import base64
 import io
+import os
 
 def get_resized_img(uploaded_file, max_size=(300,300)):
     """
@@ -27,6 +32,106 @@ def encode_bytesio_to_base64(img_bytes_io):
     Returns:
         str: base64로 인코딩된 이미지 문자열.
     """
-    # BytesIO 객체를 base64로 인코딩
-    encoded_string = base64.b64encode(img_bytes_io.read()).decode('utf-8')
-    return encoded_string
\ No newline at end of file
+    # BytesIO 객체를 base64로 인코딩 (read()로 복사하지 않고 내부 버퍼를 바로 사용)
+    encoded_string = base64.b64encode(img_bytes_io.getbuffer()).decode('utf-8')
+    return encoded_string
+
+def resize_and_encode(image_bytes, max_size=(300,300)):
+    """
+    원본 이미지 bytes를 리사이즈 후 base64 문자열로 변환
+    encode_images_parallel에서 별도 프로세스로 실행되므로 모듈 최상위 함수로 정의
+    """
+    return encode_bytesio_to_base64(get_resized_img(io.BytesIO(image_bytes), max_size))
+
+class ImagePayloadCache:
+    """
+    원본 이미지 내용의 sha256과 리사이즈 크기를 key로, base64로 인코딩된 결과를 저장하는 LRU 캐시
+    저장된 문자열 길이의 합이 max_bytes를 넘으면 가장 오래 사용하지 않은 항목부터 삭제
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(image_bytes, max_size):
+        return (hashlib.sha256(image_bytes).hexdigest(), tuple(max_size))
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, encoded):
+        with self._lock:
+            if key in self._items:
+                self.size -= len(self._items.pop(key))
+            self._items[key] = encoded
+            self.size += len(encoded)
+            while self.size > self.max_bytes and self._items:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+# 프로세스 전체에서 공유하는 기본 캐시
+image_payload_cache = ImagePayloadCache()
+
+def read_image_bytes(image_file):
+    """
+    이미지 경로 혹은 파일 객체의 내용 반환
+    BytesIO 계열(Streamlit UploadedFile 포함)은 getbuffer()로 복사 없이 내부 버퍼를 사용
+    """
+    if isinstance(image_file, (str, os.PathLike)):
+        with open(image_file, 'rb') as file:
+            return file.read()
+    if hasattr(image_file, 'getbuffer'):
+        return image_file.getbuffer()
+    return image_file.read()
+
+def get_encoded_img(image_file, max_size=(300,300), cache=image_payload_cache):
+    """
+    리사이즈 후 base64로 인코딩한 이미지 문자열 반환. 같은 내용의 이미지는 캐시된 결과 사용
+    """
+    image_bytes = read_image_bytes(image_file)
+    key = cache.make_key(image_bytes, max_size)
+    encoded = cache.get(key)
+    if encoded is None:
+        encoded = resize_and_encode(image_bytes, max_size)
+        cache.put(key, encoded)
+    return encoded
+
+def encode_images_parallel(image_paths, max_size=(300,300), max_workers=None, cache=image_payload_cache, executor=None):
+    """
+    여러 이미지의 리사이즈, 인코딩을 프로세스 풀에서 동시에 실행하고 결과를 캐시에 저장
+    executor: 여러 번 호출할 때 재사용할 ProcessPoolExecutor. None이면 호출마다 새로 생성 (프로세스 시작 비용 발생)
+    Returns:
+        dict: {이미지 경로: base64 문자열}
+    """
+    results, pending = {}, {}
+    for path in image_paths:
+        image_bytes = read_image_bytes(path)
+        key = cache.make_key(image_bytes, max_size)
+        encoded = cache.get(key)
+        if encoded is not None:
+            results[path] = encoded
+        else:
+            pending.setdefault(key, (image_bytes, []))[1].append(path)
+
+    if pending:
+        owns_executor = executor is None
+        if owns_executor:
+            executor = ProcessPoolExecutor(max_workers=max_workers)
+        try:
+            futures = {key: executor.submit(resize_and_encode, image_bytes, max_size)
+                       for key, (image_bytes, _) in pending.items()}
+            for key, future in futures.items():
+                encoded = future.result()
+                cache.put(key, encoded)
+                for path in pending[key][1]:
+                    results[path] = encoded
+        finally:
+            if owns_executor:
+                executor.shutdown()
+    return results